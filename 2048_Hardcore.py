@@ -4,28 +4,87 @@ class Image:
     def __init__(self, url, size):
         self.url = url
         self.size = size
-        self.image = simplegui.load_image(self.url)
+        self.image = None # loaded on first draw
+        self.centers = {} # sprite column -> its center on the sheet
         
     def draw(self, canvas, pos, col, size):
-        center = (self.size[0] * (col + 0.5), self.size[1] * 0.5)
+        if self.image is None:
+            self.image = simplegui.load_image(self.url)
+        center = self.centers.get(col)
+        if center is None:
+            center = self.centers[col] = (self.size[0] * (col + 0.5), self.size[1] * 0.5)
         canvas.draw_image(self.image, center, self.size, pos, size)
         
+def column(value):
+    ''' return the sprite column of a tile value on TILE, log2(value) - 1 '''
+    if value not in COLUMN:
+        COLUMN[value] = int(round(math.log(value, 2))) - 1
+    return COLUMN[value]
+
+COLUMN = {} # tile value -> sprite column
 TILE = Image('https://dl.dropboxusercontent.com/u/10977446/2048.png?dl=1', (100, 100))
 GRID = Image('https://dl.dropboxusercontent.com/u/10977446/grid.png?dl=1', (490, 490))
 STEP = {'up':(0, -1), 'down':(0, 1), 'left':(-1, 0), 'right':(1, 0)}
-ORDER = {'up':   [(i,j) for i in [0,1,2,3] for j in [0,1,2,3]],
-         'down': [(i,j) for i in [0,1,2,3] for j in [3,2,1,0]],
-         'left': [(i,j) for j in [0,1,2,3] for i in [0,1,2,3]],
-         'right':[(i,j) for j in [0,1,2,3] for i in [3,2,1,0]]}
+BOARDS = {} # board size -> (order, rays)
+
+def board_tables(size):
+    ''' return traversal orders and cells up to the wall from every cell, cached by size '''
+    if size not in BOARDS:
+        ahead, back = list(range(size)), list(range(size - 1, -1, -1))
+        order = {'up':   [(i,j) for i in ahead for j in ahead],
+                 'down': [(i,j) for i in ahead for j in back],
+                 'left': [(i,j) for j in ahead for i in ahead],
+                 'right':[(i,j) for j in ahead for i in back]}
+        rays = {}
+        for how in STEP:
+            i, j = STEP[how]
+            rays[how] = {}
+            for x, y in order['up']:
+                rays[how][(x, y)] = [(x + i * k, y + j * k) for k in range(1, size)
+                                     if 0 <= x + i * k < size and 0 <= y + j * k < size]
+        BOARDS[size] = order, rays
+    return BOARDS[size]
+
+class FreeCells:
+    ''' empty cells of a grid with O(1) add, discard and random choice '''
+    def __init__(self, cells):
+        self.cells = list(cells)
+        self.index = dict([(cell, i) for i, cell in enumerate(self.cells)])
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell):
+        return cell in self.index
+
+    def add(self, cell):
+        if cell not in self.index:
+            self.index[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def discard(self, cell):
+        if cell in self.index:
+            # fill the hole with the last cell
+            i = self.index.pop(cell)
+            last = self.cells.pop()
+            if last != cell:
+                self.cells[i] = last
+                self.index[last] = i
+
+    def choice(self, rng):
+        return rng.choice(self.cells)
+
+class Tile(object):
+    __slots__ = ['x', 'y', 'value', 'size', 'bump', 'pos', 'vel_list']
 
-class Tile:
     def __init__(self, x, y):
         self.x = x
         self.y = y
         self.value = random.choice([2,2,2,2,2,2,2,2,4])
         self.size = 50
         self.bump = 0
-        self.pos = [x * 100 + 95, y * 100 + 95]
+        self.pos = (x * 100 + 95, y * 100 + 95)
+        self.vel_list = None
 
     def merge(self):
         self.value *= 2
@@ -50,51 +109,65 @@ class Tile:
 
     def draw(self, canvas):
         self.update_size()
-        TILE.draw(canvas, self.pos, math.log(self.value, 2) - 1, [self.size] * 2)
+        TILE.draw(canvas, self.pos, column(self.value), [self.size] * 2)
 
 class Game:
-    def __init__(self):
-        self.frame = simplegui.create_frame('2048', 490, 490)
+    def __init__(self, size=4):
+        self.size = size
+        self.order, self.rays = board_tables(size)
+        self.frame = simplegui.create_frame('2048', 100 * size + 90, 100 * size + 90)
         self.frame.add_button('New Game', self.start)
         self.frame.set_keydown_handler(self.keydown)
         self.frame.set_draw_handler(self.draw)
         self.text = self.frame.add_label('')
+        self.instant_button = self.frame.add_button('Instant Moves: Off', self.toggle_instant, 100)
+        self.instant = False # apply moves at once, animation only follows
         self.frame.start()
     
     def start(self):
         self.text.set_text('Use Arrow Keys to Move')
-        self.grid = [[None for x in range(4)] for x in range(4)]
+        self.grid = [[None for x in range(self.size)] for x in range(self.size)]
+        self.free = FreeCells(self.order['up'])
         self.moving_tiles = []
         self.merged_tiles = []
         self.new_tile()
         self.new_tile()
         
     def new_tile(self):
-        x, y = random.choice([(i, j) for (i, j) in ORDER['up'] if not self.grid[i][j]])
+        x, y = self.free.choice(random)
+        self.free.discard((x, y))
         self.grid[x][y] = Tile(x, y)
         
+    def toggle_instant(self):
+        if self.moving_tiles:
+            self.finish_moving()
+        self.instant = not self.instant
+        self.instant_button.set_text('Instant Moves: ' + ('On' if self.instant else 'Off'))
+        
     def keydown(self, key):
         self.text.set_text('')
+        if self.instant and self.moving_tiles:
+            self.finish_moving()
         if not self.moving_tiles:
             for i in ['up','down','left','right']:
                 if key == simplegui.KEY_MAP[i]:
                     self.merger = None # keep track of last merger in case merge twice
-                    for (x, y) in ORDER[i]:
+                    for (x, y) in self.order[i]:
                         if self.grid[x][y]:
-                            self.move_tile(x, y, STEP[i])
+                            self.move_tile(x, y, i)
+                    if self.moving_tiles and self.instant:
+                        self.commit_move()
                         
-    def move_tile(self, x, y, step):
+    def move_tile(self, x, y, how):
         tile = self.grid[x][y]
         
         # find the destination of current tile by updating x and y
-        while 0 <= x + step[0] <= 3 and 0 <= y + step[1] <= 3:
-            new_tile = self.grid[x + step[0]][y + step[1]]
+        for a, b in self.rays[how][(x, y)]:
+            new_tile = self.grid[a][b]
             if new_tile == None:
-                x += step[0]
-                y += step[1]
+                x, y = a, b
             elif (new_tile.value == tile.value) and (new_tile != self.merger):
-                x += step[0]
-                y += step[1]
+                x, y = a, b
                 self.merger = tile # will merge but stay
                 self.merged_tiles.append(new_tile) # will be merged and removed
                 break
@@ -105,12 +178,20 @@ class Game:
             self.moving_tiles.append(tile)
             self.grid[tile.x][tile.y] = None
             self.grid[x][y] = tile
+            self.free.add((tile.x, tile.y))
+            self.free.discard((x, y))
             tile.vel_list = [((x-tile.x)*i, (y-tile.y)*i) for i in [10, 20, 40, 20, 10]]
             tile.x, tile.y = x, y
     
     def draw(self, canvas):
         # draw board
-        GRID.draw(canvas, (245, 245), 0, GRID.size)
+        if self.size == 4:
+            GRID.draw(canvas, (245, 245), 0, GRID.size)
+        else:
+            for x, y in self.order['up']:
+                a, b = x * 100 + 50, y * 100 + 50
+                cell = [(a, b), (a + 90, b), (a + 90, b + 90), (a, b + 90)]
+                canvas.draw_polygon(cell, 1, '#CDC1B4', '#CDC1B4')
         
         # draw tiles
         for row in self.grid:
@@ -130,15 +211,27 @@ class Game:
         if self.moving_tiles[0].vel_list:
             for tile in self.moving_tiles:
                 vel = tile.vel_list.pop()
-                tile.pos = [tile.pos[0] + vel[0], tile.pos[1] + vel[1]]
+                tile.pos = (tile.pos[0] + vel[0], tile.pos[1] + vel[1])
         else:
-            for tile in self.merged_tiles:
-                self.grid[tile.x][tile.y].merge()
-                if self.grid[tile.x][tile.y].value == 2048:
-                    self.text.set_text('You Win! Go Beyond?')
-            self.merged_tiles = []
-            self.moving_tiles = []
-            self.new_tile()
+            self.finish_moving()
+            
+    def finish_moving(self):
+        ''' put moving tiles in place, commit the move unless already done '''
+        for tile in self.moving_tiles:
+            tile.vel_list = None
+            tile.pos = (tile.x * 100 + 95, tile.y * 100 + 95)
+        if not self.instant:
+            self.commit_move()
+        self.merged_tiles = []
+        self.moving_tiles = []
+        
+    def commit_move(self):
+        ''' merge tiles and add a new one, the logical end of a move '''
+        for tile in self.merged_tiles:
+            self.grid[tile.x][tile.y].merge()
+            if self.grid[tile.x][tile.y].value == 2048:
+                self.text.set_text('You Win! Go Beyond?')
+        self.new_tile()
             
 game = Game()
 game.start()
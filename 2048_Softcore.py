@@ -1,40 +1,325 @@
-import simplegui, random, math
+import simplegui, random, math, time, collections
 
 class Image:
     def __init__(self, url, size):
         self.url = url
         self.size = size
-        self.image = simplegui.load_image(self.url)
+        self.image = None # loaded on first draw
+        self.centers = {} # sprite column -> its center on the sheet
         
     def draw(self, canvas, pos, col, size):
-        center = (self.size[0] * (col + 0.5), self.size[1] * 0.5)
+        if self.image is None:
+            self.image = simplegui.load_image(self.url)
+        center = self.centers.get(col)
+        if center is None:
+            center = self.centers[col] = (self.size[0] * (col + 0.5), self.size[1] * 0.5)
         canvas.draw_image(self.image, center, self.size, pos, size)
         
+def column(value):
+    ''' return the sprite column of a tile value on TILE, log2(value) - 1 '''
+    if value not in COLUMN:
+        COLUMN[value] = int(round(math.log(value, 2))) - 1
+    return COLUMN[value]
+
+COLUMN = {} # tile value -> sprite column
 TILE = Image('https://dl.dropboxusercontent.com/u/10977446/2048.png?dl=1', (100, 100))
 GRID = Image('https://dl.dropboxusercontent.com/u/10977446/grid.png?dl=1', (490, 490))
 STEP = {'up':(0, -1), 'down':(0, 1), 'left':(-1, 0), 'right':(1, 0)}
-ORDER = {'up':   [(i,j) for i in [0,1,2,3] for j in [0,1,2,3]],
-         'down': [(i,j) for i in [0,1,2,3] for j in [3,2,1,0]],
-         'left': [(i,j) for j in [0,1,2,3] for i in [0,1,2,3]],
-         'right':[(i,j) for j in [0,1,2,3] for i in [3,2,1,0]]}
+BOARDS = {} # board size -> (order, rays, neighbors)
+
+def board_tables(size):
+    ''' return traversal orders, cells up to the wall and neighbors of every cell, cached by size '''
+    if size not in BOARDS:
+        ahead, back = list(range(size)), list(range(size - 1, -1, -1))
+        order = {'up':   [(i,j) for i in ahead for j in ahead],
+                 'down': [(i,j) for i in ahead for j in back],
+                 'left': [(i,j) for j in ahead for i in ahead],
+                 'right':[(i,j) for j in ahead for i in back]}
+        rays, neighbors = {}, {}
+        for how in STEP:
+            i, j = STEP[how]
+            rays[how] = {}
+            for x, y in order['up']:
+                rays[how][(x, y)] = [(x + i * k, y + j * k) for k in range(1, size)
+                                     if 0 <= x + i * k < size and 0 <= y + j * k < size]
+        for x, y in order['up']:
+            neighbors[(x, y)] = [rays[how][(x, y)][0] for how in STEP if rays[how][(x, y)]]
+        BOARDS[size] = order, rays, neighbors
+    return BOARDS[size]
+
+SPAWN = [2,2,2,2,2,2,2,2,4] # values a new tile draws from
+
+# bitboard engine: 16 nibbles of tile exponents, cell (x, y) at bit 4 * (4 * y + x);
+# pack and unpack also take bigger boards and wider cells, the rest is for 4 x 4 only
+EXPONENT = dict([(2 ** e, e) for e in range(1, 16)])
+ROW_LEFT, ROW_RIGHT, ROW_SCORE, ROW_ENTROPY = [], [], [], []
+
+def row_move(cells):
+    ''' slide and merge a row of exponents toward index 0, return new row and score '''
+    tiles = [e for e in cells if e]
+    row, score, i = [], 0, 0
+    while i < len(tiles):
+        if i + 1 < len(tiles) and tiles[i] == tiles[i + 1] < 15:
+            row.append(tiles[i] + 1)
+            score += 2 ** (tiles[i] + 1)
+            i += 2
+        else:
+            row.append(tiles[i])
+            i += 1
+    return row + [0] * (4 - len(row)), score
+
+def row_entropy(cells):
+    ''' grid_entropy of one row: left-right neighbor differences, empty counts as log2 '''
+    entropy = 0
+    for i in range(4):
+        if cells[i]:
+            for j in [i - 1, i + 1]:
+                if 0 <= j <= 3:
+                    entropy += abs(cells[i] - cells[j]) if cells[j] else cells[i]
+    return entropy
+
+def pack_row(cells):
+    return cells[0] | cells[1] << 4 | cells[2] << 8 | cells[3] << 12
+
+def build_tables():
+    ''' fill the lookup tables for all 65536 rows, only once '''
+    if ROW_LEFT:
+        return
+    for row in range(65536):
+        cells = [row & 0xF, row >> 4 & 0xF, row >> 8 & 0xF, row >> 12]
+        left, score = row_move(cells)
+        right = row_move(cells[::-1])[0]
+        ROW_LEFT.append(pack_row(left))
+        ROW_RIGHT.append(pack_row(right[::-1]))
+        ROW_SCORE.append(score)
+        ROW_ENTROPY.append(row_entropy(cells))
+
+def exponent(value):
+    ''' return e of a tile of value 2 ** e, however big '''
+    e = 0
+    while value > 1:
+        value >>= 1
+        e += 1
+    return e
+
+def cell_bits(size):
+    ''' return the bits a cell needs for any tile of a size x size board,
+        which is 2 ** (size * size + 1) at most '''
+    bits = 1
+    while 2 ** bits <= size * size + 1:
+        bits += 1
+    return bits
+
+def pack(grid, bits=4):
+    ''' return a grid of tiles as a board, cell (x, y) at bit bits * (size * y + x);
+        with 4 bits, for the bitboard engine, tiles above 2 ** 15 are a KeyError '''
+    board, size = 0, len(grid)
+    for x, y in board_tables(size)[0]['up']:
+        if grid[x][y]:
+            e = EXPONENT[grid[x][y].value] if bits == 4 else exponent(grid[x][y].value)
+            board |= e << bits * (size * y + x)
+    return board
+
+def searchable(grid):
+    ''' return True if the bitboard engine holds the grid: 4 x 4, no tile above 2 ** 15 '''
+    return len(grid) == 4 and all([not tile or tile.value in EXPONENT
+                                   for col in grid for tile in col])
+
+def unpack(board, size, bits=4):
+    ''' return a board as a grid of new tiles '''
+    grid = [[None for x in range(size)] for x in range(size)]
+    mask = 2 ** bits - 1
+    for x, y in board_tables(size)[0]['up']:
+        e = board >> bits * (size * y + x) & mask
+        if e:
+            grid[x][y] = Tile(x, y, 2 ** e)
+    return grid
+
+def transpose(board):
+    ''' swap cell (x, y) with cell (y, x) '''
+    a = board & 0xF0F00F0FF0F00F0F | (board & 0x0000F0F00000F0F0) << 12 \
+        | (board & 0x0F0F00000F0F0000) >> 12
+    return a & 0xFF00FF0000FF00FF | (a & 0x00FF00FF00000000) >> 24 \
+        | (a & 0x00000000FF00FF00) << 24
+
+def board_move(board, how):
+    ''' return board after sliding toward how, the same board if nothing moves '''
+    if how == 'up' or how == 'down':
+        board = transpose(board)
+    t = ROW_LEFT if how == 'left' or how == 'up' else ROW_RIGHT
+    board = t[board & 0xFFFF] | t[board >> 16 & 0xFFFF] << 16 \
+            | t[board >> 32 & 0xFFFF] << 32 | t[board >> 48] << 48
+    if how == 'up' or how == 'down':
+        board = transpose(board)
+    return board
+
+def rows_sum(table, board):
+    return table[board & 0xFFFF] + table[board >> 16 & 0xFFFF] \
+           + table[board >> 32 & 0xFFFF] + table[board >> 48]
+
+def move_score(board, how):
+    ''' return the value of tiles merged by sliding toward how '''
+    if how == 'up' or how == 'down':
+        board = transpose(board)
+    return rows_sum(ROW_SCORE, board)
+
+def board_entropy(board):
+    ''' grid_entropy of a board '''
+    return rows_sum(ROW_ENTROPY, board) + rows_sum(ROW_ENTROPY, transpose(board))
+
+def board_free(board):
+    ''' return a mask with the lowest bit of every empty cell set '''
+    board |= board >> 2
+    board |= board >> 1
+    return ~board & 0x1111111111111111
+
+def board_empty(board):
+    ''' return the number of empty cells '''
+    return bin(board_free(board)).count('1')
+
+class FreeCells:
+    ''' empty cells of a grid with O(1) add, discard and random choice '''
+    def __init__(self, cells):
+        self.cells = list(cells)
+        self.index = dict([(cell, i) for i, cell in enumerate(self.cells)])
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell):
+        return cell in self.index
+
+    def add(self, cell):
+        if cell not in self.index:
+            self.index[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def discard(self, cell):
+        if cell in self.index:
+            # fill the hole with the last cell
+            i = self.index.pop(cell)
+            last = self.cells.pop()
+            if last != cell:
+                self.cells[i] = last
+                self.index[last] = i
+
+    def choice(self, rng):
+        return rng.choice(self.cells)
+
+class History:
+    ''' bounded ring of packed boards for undo and redo, cell_bits wide so
+        that any tile fits '''
+    def __init__(self, size=1000):
+        self.ring = [None] * size
+        self.first = 0   # ring index of the oldest board
+        self.count = 0   # boards in the ring
+        self.current = 0 # offset of the shown board from the oldest
+
+    def push(self, board):
+        ''' add board after the current one, dropping the redo boards '''
+        if self.count and self.ring[(self.first + self.current) % len(self.ring)] == board:
+            return
+        self.count = self.current + 1 if self.count else 0
+        if self.count == len(self.ring):
+            self.first = (self.first + 1) % len(self.ring)
+            self.count -= 1
+        self.ring[(self.first + self.count) % len(self.ring)] = board
+        self.current = self.count
+        self.count += 1
 
-class Tile:
-    def __init__(self, x, y):
+    def undo(self):
+        ''' return the previous board, None at the oldest '''
+        if self.current > 0:
+            self.current -= 1
+            return self.ring[(self.first + self.current) % len(self.ring)]
+
+    def redo(self):
+        ''' return the next board, None at the newest '''
+        if self.current < self.count - 1:
+            self.current += 1
+            return self.ring[(self.first + self.current) % len(self.ring)]
+
+class Timeout(Exception):
+    pass
+
+class Searcher:
+    ''' expectimax over boards, new tiles drawn as in SPAWN '''
+    def __init__(self, depth=3, budget=100, size=100000):
+        self.depth = depth   # player moves to look ahead
+        self.budget = budget # milliseconds per search, 0 for no limit
+        self.size = size     # transposition table entries
+        self.table = collections.OrderedDict()
+        self.deadline = None
+        self.spawns = [(EXPONENT[v], SPAWN.count(v) / float(len(SPAWN))) for v in sorted(set(SPAWN))]
+
+    def search(self, board):
+        ''' return the best direction, '' if no move is possible '''
+        build_tables()
+        deadline = time.time() + self.budget / 1000.0
+        direction = ''
+        self.deadline = None # always finish depth 1
+        for depth in range(1, self.depth + 1):
+            try:
+                direction = self.best(board, depth)[1]
+            except Timeout:
+                break
+            if self.budget:
+                self.deadline = deadline
+        return direction
+
+    def best(self, board, depth):
+        ''' max node: return value and direction of the best move '''
+        value, direction = -1e6, '' # game over
+        for how in ['up','down','left','right']:
+            moved = board_move(board, how)
+            if moved != board:
+                expected = self.expect(moved, depth)
+                if expected > value or not direction:
+                    value, direction = expected, how
+        return value, direction
+
+    def expect(self, board, depth):
+        ''' chance node: average value over every new tile '''
+        if depth == 1:
+            return -board_entropy(board)
+        key = board << 4 | depth
+        if key in self.table:
+            value = self.table.pop(key) # re-insert as most recent
+            self.table[key] = value
+            return value
+        if self.deadline and time.time() > self.deadline:
+            raise Timeout
+        value, free = 0, board_free(board)
+        cells = bin(free).count('1')
+        while free:
+            cell = free & -free # lowest bit of one empty cell
+            free ^= cell
+            for e, p in self.spawns:
+                value += p * self.best(board | cell * e, depth - 1)[0]
+        value /= cells
+        self.table[key] = value
+        if len(self.table) > self.size:
+            self.table.popitem(last=False)
+        return value
+
+class Tile(object):
+    __slots__ = ['x', 'y', 'value', 'size', 'bump', 'pos', 'vel_list']
+
+    def __init__(self, x, y, value):
         self.x = x
         self.y = y
-        self.value = random.choice([2,2,2,2,2,2,2,2,4])
+        self.value = value
         self.size = 50
         self.bump = 0
-        self.pos = [x * 100 + 95, y * 100 + 95]
+        self.pos = (x * 100 + 95, y * 100 + 95)
+        self.vel_list = None
 
     def merge(self):
         self.value *= 2
         self.bump = 1
 
     def copy(self):
-        tile = Tile(self.x, self.y)
-        tile.value = self.value
-        return tile
+        return Tile(self.x, self.y, self.value)
     
     def update_size(self):
         # appear animation
@@ -55,62 +340,76 @@ class Tile:
 
     def draw(self, canvas):
         self.update_size()
-        TILE.draw(canvas, self.pos, math.log(self.value, 2) - 1, [self.size] * 2)
+        TILE.draw(canvas, self.pos, column(self.value), [self.size] * 2)
 
 class Game:
-    def __init__(self):
-        self.frame = simplegui.create_frame('2048', 490, 490)
+    def __init__(self, rng=random, size=4):
+        self.rng = rng # random or a seeded random.Random
+        self.size = size # the bot searches bitboards on 4 x 4 only
+        self.frame = simplegui.create_frame('2048', 100 * size + 90, 100 * size + 90)
         self.frame.add_button('New Game', self.start, 100)
         self.frame.set_keydown_handler(self.keydown)
         self.frame.set_draw_handler(self.draw)
         self.text = self.frame.add_label('')
         self.frame.add_button('Undo', self.undo, 100)
+        self.frame.add_button('Redo', self.redo, 100)
         self.frame.add_button('Bot Move', self.bot_move, 100)
+        self.instant_button = self.frame.add_button('Instant Moves: Off', self.toggle_instant, 100)
+        self.instant = False # apply moves at once, animation only follows
+        self.searcher = Searcher()
         self.frame.start()
     
     def start(self):
         self.text.set_text('Arrow Keys or Bot')
-        self.grid = [[None for x in range(4)] for x in range(4)]
+        self.grid = [[None for x in range(self.size)] for x in range(self.size)]
+        self.free = FreeCells(board_tables(self.size)[0]['up'])
         self.moving_tiles = []
         self.merged_tiles = []
         self.new_tile()
         self.new_tile()
-        self.history = None
+        self.history = History()
+        self.history.push(pack(self.grid, cell_bits(self.size)))
         
     def new_tile(self):
-        x, y = random.choice([(i, j) for (i, j) in ORDER['up'] if not self.grid[i][j]])
-        self.grid[x][y] = Tile(x, y)
+        x, y = self.free.choice(self.rng)
+        self.free.discard((x, y))
+        self.grid[x][y] = Tile(x, y, self.rng.choice(SPAWN))
         
     def copy(self):
         return [[x.copy() if x else None for x in col] for col in self.grid]
     
+    def toggle_instant(self):
+        if self.moving_tiles:
+            self.finish_moving()
+        self.instant = not self.instant
+        self.instant_button.set_text('Instant Moves: ' + ('On' if self.instant else 'Off'))
+        
     def keydown(self, key):
         self.text.set_text('')
+        if self.instant and self.moving_tiles:
+            self.finish_moving()
         if not self.moving_tiles:
-            history = self.copy()
             for i in ['up','down','left','right']:
                 if key == simplegui.KEY_MAP[i]:
-                    if self.is_moved(self.grid, i, True):
-                        self.history = history
+                    if self.is_moved(self.grid, i, True) and self.instant:
+                        self.commit_move()
                     
     def is_moved(self, grid, how, is_real):
         moved = False
         merger = None # keep track of last merger in case merge twice
-        for x, y in ORDER[how]:
+        order, rays, neighbors = board_tables(len(grid))
+        for x, y in order[how]:
             if grid[x][y]:
                 a, b = x, y # scouts of x and y
-                i, j = STEP[how]
                 tile1 = grid[x][y]
                 
                 # find the destination of tile1 by updating a & b
-                while 0 <= a+i <= 3 and 0 <= b+j <= 3:
-                    tile2 = grid[a+i][b+j]
+                for c, d in rays[how][(x, y)]:
+                    tile2 = grid[c][d]
                     if tile2 == None:
-                        a += i
-                        b += j
+                        a, b = c, d
                     elif tile2.value == tile1.value and tile2 != merger:
-                        a += i
-                        b += j
+                        a, b = c, d
                         merger = tile1
                         if is_real:
                             self.merged_tiles.append(tile2)
@@ -126,13 +425,21 @@ class Game:
                     grid[a][b] = tile1
                     tile1.x, tile1.y = a, b
                     if is_real:
+                        self.free.add((x, y))
+                        self.free.discard((a, b))
                         self.moving_tiles.append(tile1)
                         tile1.vel_list = [((a-x)*i, (b-y)*i) for i in [10,20,40,20,10]]
         return moved
 
     def draw(self, canvas):
         # draw board
-        GRID.draw(canvas, (245, 245), 0, GRID.size)
+        if self.size == 4:
+            GRID.draw(canvas, (245, 245), 0, GRID.size)
+        else:
+            for x, y in board_tables(self.size)[0]['up']:
+                a, b = x * 100 + 50, y * 100 + 50
+                cell = [(a, b), (a + 90, b), (a + 90, b + 90), (a, b + 90)]
+                canvas.draw_polygon(cell, 1, '#CDC1B4', '#CDC1B4')
         
         # draw tiles
         for col in self.grid:
@@ -152,21 +459,55 @@ class Game:
         if self.moving_tiles[0].vel_list:
             for tile in self.moving_tiles:
                 vel = tile.vel_list.pop()
-                tile.pos = [tile.pos[0] + vel[0], tile.pos[1] + vel[1]]
+                tile.pos = (tile.pos[0] + vel[0], tile.pos[1] + vel[1])
         else:
-            for tile in self.merged_tiles:
-                self.grid[tile.x][tile.y].merge()
-                if self.grid[tile.x][tile.y].value == 2048:
-                    self.text.set_text('You Win! Go Beyond?')
-            self.merged_tiles = []
-            self.moving_tiles = []
-            self.new_tile()
+            self.finish_moving()
+            
+    def finish_moving(self):
+        ''' put moving tiles in place, commit the move unless already done '''
+        for tile in self.moving_tiles:
+            tile.vel_list = None
+            tile.pos = (tile.x * 100 + 95, tile.y * 100 + 95)
+        if not self.instant:
+            self.commit_move()
+        self.merged_tiles = []
+        self.moving_tiles = []
+        
+    def commit_move(self):
+        ''' merge tiles and add a new one, the logical end of a move '''
+        for tile in self.merged_tiles:
+            self.grid[tile.x][tile.y].merge()
+            if self.grid[tile.x][tile.y].value == 2048:
+                self.text.set_text('You Win! Go Beyond?')
+        self.new_tile()
+        self.history.push(pack(self.grid, cell_bits(self.size)))
             
     def undo(self):
-        if self.history:
-            self.grid = self.history
+        if self.moving_tiles:
+            self.finish_moving()
+        self.restore(self.history.undo())
+        
+    def redo(self):
+        if self.moving_tiles:
+            self.finish_moving()
+        self.restore(self.history.redo())
+        
+    def restore(self, board):
+        if board is not None:
+            self.grid = unpack(board, self.size, cell_bits(self.size))
+            self.free = FreeCells([(i, j) for (i, j) in board_tables(self.size)[0]['up']
+                                   if not self.grid[i][j]])
             
     def bot_move(self):
+        if searchable(self.grid):
+            direction = self.searcher.search(pack(self.grid))
+        else:
+            direction = self.greedy_move()
+        if direction:
+            self.keydown(simplegui.KEY_MAP[direction])
+            
+    def greedy_move(self):
+        ''' return the direction leaving the lowest grid entropy, on any board size '''
         min_entro = float('inf')
         direction = ''
         for i in ['up','down','left','right']:
@@ -176,8 +517,7 @@ class Game:
                 if min_entro >= entropy:
                     min_entro = entropy
                     direction = i
-        if direction:
-            self.keydown(simplegui.KEY_MAP[direction])
+        return direction
             
     def grid_entropy(self, grid):
         '''sum of each tile's degree of disorder'''
@@ -195,8 +535,7 @@ class Game:
     
     def neibor(self, tile, grid):
         '''return up-down-left-right neighbors of given tile'''
-        x, y = tile.x, tile.y
-        return [grid[x+i][y+j] for i,j in STEP.values() if 0<=x+i<=3 and 0<=y+j<=3]
+        return [grid[a][b] for a, b in board_tables(len(grid))[2][(tile.x, tile.y)]]
             
 game = Game()
 game.start()
@@ -4,6 +4,8 @@ width, height = 400, 400
 gap_width, gap_height = 40, 80
 gap_pos_min, gap_pos_max = 80, 280
 ground_height = 42
+gravity, flap_vel = 0.1, -3
+pipe_spacing = 150
 center = [width / 2, height / 2]
 half_gap = [gap_width / 2, gap_height / 2]
 
@@ -11,23 +13,26 @@ class Image:
     def __init__(self, url, size):
         self.url = url
         self.size = size
-        self.image = simplegui.load_image(self.url)
+        self.image = None # loaded on first draw
         
     def draw(self, canvas, pos, size, angle=0):
+        if self.image is None:
+            self.image = simplegui.load_image(self.url)
         center = [size[0] / 2.0, size[1] / 2.0]
         canvas.draw_image(self.image, center, size, pos, size, angle)
         
 class Sound:
-    def __init__(self, url):
+    def __init__(self, url, channels=1):
         self.url = url
+        self.channels = channels # copies taking turns, so plays can overlap
         self.count = 0
-        self.sound = {}
-        for i in range(3):
-            self.sound[i] = simplegui.load_sound(self.url)
+        self.sound = {} # loaded on first play
         
     def play(self):
+        if self.count not in self.sound:
+            self.sound[self.count] = simplegui.load_sound(self.url)
         self.sound[self.count].play()
-        self.count = (self.count + 1) % 3
+        self.count = (self.count + 1) % self.channels
 
 bird0 = Image('https://dl.dropboxusercontent.com/u/10977446/bird0.png?dl=1', [30, 22])
 bird1 = Image('https://dl.dropboxusercontent.com/u/10977446/bird1.png?dl=1', [30, 22])
@@ -37,10 +42,10 @@ ground = Image('https://dl.dropboxusercontent.com/u/10977446/ground.png?dl=1', [
 background = Image('https://dl.dropboxusercontent.com/u/10977446/background.png?dl=1', [400, 400])
 spacebar = Image('https://dl.dropboxusercontent.com/u/10977446/spacebar.png?dl=1', [100, 20])
 board = Image('https://dl.dropboxusercontent.com/u/10977446/board.png?dl=1', [78, 158])
-coin = simplegui.load_sound('https://dl.dropboxusercontent.com/u/10977446/coin.mp3?dl=1')
-bump = simplegui.load_sound('https://dl.dropboxusercontent.com/u/10977446/bump.mp3?dl=1')
-end = simplegui.load_sound('https://dl.dropboxusercontent.com/u/10977446/end.mp3?dl=1')
-jump = Sound('https://dl.dropboxusercontent.com/u/10977446/jump.mp3?dl=1')
+coin = Sound('https://dl.dropboxusercontent.com/u/10977446/coin.mp3?dl=1')
+bump = Sound('https://dl.dropboxusercontent.com/u/10977446/bump.mp3?dl=1')
+end = Sound('https://dl.dropboxusercontent.com/u/10977446/end.mp3?dl=1')
+jump = Sound('https://dl.dropboxusercontent.com/u/10977446/jump.mp3?dl=1', 3)
 
 class Bird:
     def __init__(self, pos):
@@ -56,8 +61,8 @@ class Bird:
     def out(self, up, down):
         return self.pos[1] - self.radius < up or self.pos[1] + self.radius > down
     
-    def fly(self):
-        self.time = (self.time + 0.2) % (2 * math.pi)
+    def fly(self, frames=1):
+        self.time = (self.time + 0.2 * frames) % (2 * math.pi)
         if 0 <= self.time < math.pi / 2:
             self.image = bird0
         elif math.pi <= self.time < math.pi * 3 / 2:
@@ -66,26 +71,53 @@ class Bird:
             self.image = bird1
     
     def fall(self):
-        self.vel += 0.1
+        self.vel += gravity
         self.pos[1] += self.vel
         
     def flap(self):
-        self.vel = -3
+        self.vel = flap_vel
         
     def draw(self, canvas):
         self.image.draw(canvas, self.pos, self.image.size, 0.12 * self.vel)
         
+class Sway:
+    ''' 20 * sin(vertical move) of a pipe at one scale after each of its
+        moves, from the same float sums as moving it, built as far as needed '''
+    def __init__(self, scale):
+        self.step = 0.01 * scale
+        self.phase = 0
+        self.table = [0.0]
+        
+    def __getitem__(self, moves):
+        while len(self.table) <= moves:
+            self.phase += self.step
+            self.table.append(20 * math.sin(self.phase))
+        return self.table[moves]
+        
+SWAYS = dict([(scale, Sway(scale)) for scale in range(-5, 5)])
+
 class Pipe:
     def __init__(self, pos, vertical_move_scale=0):
         self.pos = pos # gap center
-        self.vertical_center = self.pos[1]
-        self.vertical_move = 0
+        self.reset(pos[0], pos[1], vertical_move_scale)
+        
+    def reset(self, x, y, vertical_move_scale):
+        ''' make this the pipe at x with its gap centered at y '''
+        self.pos[0] = x
+        self.pos[1] = y
+        self.vertical_center = y
+        self.moves = 0
         self.vertical_move_scale = vertical_move_scale
+        self.sway = SWAYS[vertical_move_scale]
+        
+    def move(self, frames=1):
+        self.pos[0] -= frames
+        self.moves += frames
+        self.pos[1] = self.vertical_center + self.sway[self.moves]
         
-    def move(self):
-        self.pos[0] -= 1
-        self.vertical_move += 0.01 * self.vertical_move_scale
-        self.pos[1] = self.vertical_center + 20 * math.sin(self.vertical_move)
+    def y(self, frames):
+        ''' return the gap center after moving frames more frames '''
+        return self.vertical_center + self.sway[self.moves + frames]
         
     def draw(self, canvas):
         upper_size = [pipe.size[0], self.pos[1] - half_gap[1]]
@@ -95,28 +127,57 @@ class Pipe:
         pipe.draw(canvas, upper_pos, upper_size, math.pi)
         pipe.draw(canvas, lower_pos, lower_size)
         
+class Course:
+    ''' the pipes of one game, (gap center, vertical move scale) each, drawn
+        from rng only as far as they are asked for and kept '''
+    def __init__(self, rng, pipes=None):
+        self.rng = rng
+        self.pipes = pipes or []
+        
+    def __getitem__(self, i):
+        while len(self.pipes) <= i:
+            # the first three pipes stand still
+            gap = self.rng.randrange(gap_pos_min, gap_pos_max)
+            self.pipes.append((gap, self.rng.randrange(-5, 5) if len(self.pipes) >= 3 else 0))
+        return self.pipes[i]
+        
+COURSES = {} # seed -> its course, shared by every game on it
+
+def course(seed=None):
+    ''' return the course of seed, or a new one from the global random '''
+    if seed is None:
+        return Course(random)
+    if seed not in COURSES:
+        COURSES[seed] = Course(random.Random(seed))
+    return COURSES[seed]
+
 class Ground:
     def __init__(self, y):
         self.x1 = center[0]
         self.x2 = center[0] * 3
         self.y = y
         
-    def move(self):
-        self.x1 -= 1
-        self.x2 -= 1
-        if self.x1 == - center[0]:
-            self.x1 = center[0] * 3
-        if self.x2 == - center[0]:
-            self.x2 = center[0] * 3
+    def move(self, frames=1):
+        self.x1 -= frames
+        self.x2 -= frames
+        while self.x1 <= - center[0]:
+            self.x1 += center[0] * 4
+        while self.x2 <= - center[0]:
+            self.x2 += center[0] * 4
             
     def draw(self, canvas):
         ground.draw(canvas, [self.x1, self.y], ground.size)
         ground.draw(canvas, [self.x2, self.y], ground.size)
         
 class Game:
-    def __init__(self):
+    def __init__(self, seed=None):
+        self.seed = seed # the same pipes every game if set
+        self.course = None
+        self.count = 0 # pipes taken from the course
         self.bird = None
-        self.pipes = None
+        self.pipes = None # three pipes, reused round in a ring
+        self.first = 0 # index of the front one
+        self.pilot = None # flaps when pilot(game) is true, see flappy_pilot.py
         self.ground = Ground(364)
         self.score = None
         self.best = 0
@@ -127,57 +188,102 @@ class Game:
         
     def start(self):
         self.bird = Bird([180, height / 2])
-        self.pipes = [Pipe([500, random.randrange(gap_pos_min, gap_pos_max)]), 
-                 Pipe([650, random.randrange(gap_pos_min, gap_pos_max)]),
-                 Pipe([800, random.randrange(gap_pos_min, gap_pos_max)])]
+        self.course = course(self.seed)
+        self.count = 0
+        if self.pipes is None:
+            self.pipes = [Pipe([0, 0]), Pipe([0, 0]), Pipe([0, 0])]
+        self.first = 0
+        for pipe, x in zip(self.pipes, [500, 650, 800]):
+            self.place(pipe, x)
         self.score = 0
         self.time = 0
         self.phase[0] = True
         
-    def update(self):
-        if self.phase[3]:
-            return
-        
-        if self.bird.out(-float('inf'), height - 42):
-            end.play()
-            self.phase[1] = False
-            self.phase[2] = False
-            self.phase[3] = True
-            return
+    def place(self, pipe, x):
+        ''' reset pipe to the next pipe of the course, at x '''
+        gap, scale = self.course[self.count]
+        self.count += 1
+        pipe.reset(x, gap, scale)
         
-        if self.pipes[0].pos[0] + half_gap[0] < 0:
-            self.pipes.pop(0)
-            x = self.pipes[-1].pos[0] + 150
-            self.pipes.append(Pipe([x, random.randrange(gap_pos_min, gap_pos_max)], random.randrange(-5, 5)))
+    def update(self):
+        if self.pilot and self.phase[1] and self.pilot(self):
+            jump.play()
+            self.bird.flap()
+        self.advance(1)
         
-        if self.phase[0]:
-            self.bird.fly()
-            self.bird.pos[1] = height / 2 + 4 * math.sin(self.bird.time)
-            self.ground.move()
+    def advance(self, frames):
+        ''' move the game on by frames frames, the same as that many updates '''
+        while frames > 0 and not self.phase[3]:
+            if self.bird.out(-float('inf'), height - ground_height):
+                end.play()
+                self.phase[1] = False
+                self.phase[2] = False
+                self.phase[3] = True
+                return
+            
+            front = self.pipes[self.first]
+            if front.pos[0] + half_gap[0] < 0:
+                self.place(front, self.pipes[self.first - 1].pos[0] + pipe_spacing)
+                self.first = (self.first + 1) % len(self.pipes)
+                
+            if self.phase[0]:
+                self.bird.fly()
+                self.bird.pos[1] = height / 2 + 4 * math.sin(self.bird.time)
+                self.ground.move()
+                frames -= 1
+            elif self.phase[1]:
+                # until the front pipe is due to be replaced
+                frames -= self.sweep(min(frames, int(self.pipes[self.first].pos[0] + half_gap[0]) + 1))
+            else:
+                self.bird.fall()
+                frames -= 1
+                
+    def sweep(self, frames):
+        ''' play frames frames in one step, or until the bird crashes or is
+            about to hit the ground; return the frames played '''
+        bird = self.bird
+        # the bird falls frame by frame, the ground ends the game at the
+        # start of the frame after it is reached
+        heights, vels = [], []
+        y, vel = bird.pos[1], bird.vel
+        while len(heights) < frames and not (heights and y + bird.radius > height - ground_height):
+            vel += gravity
+            y += vel
+            heights.append(y)
+            vels.append(vel)
             
-        elif self.phase[1]:
-            self.bird.fly()
-            self.bird.fall()
-            self.ground.move()
-            for pipe in self.pipes:
-                pipe.move()
-                if pipe.pos[0] == self.bird.pos[0]:
-                    coin.play()
-                    self.score += 1
-                if self.bird.between(pipe.pos[0] - half_gap[0], pipe.pos[0] + half_gap[0]):
-                    if self.bird.out(pipe.pos[1] - half_gap[1], pipe.pos[1] + half_gap[1]):
-                        bump.play()
-                        self.bird.vel = 0
-                        self.phase[1] = False
-                        self.phase[2] = True
-                        if self.score > self.best:
-                            self.best = self.score
-                            self.new = 'new'
-                        else:
-                            self.new = ''
-                            
-        elif self.phase[2]:
-            self.bird.fall()
+        # the first frame the bird is out of the gap of a pipe it is within
+        played, crashed = len(heights), False
+        left = bird.pos[0] - bird.radius - half_gap[0]
+        right = bird.pos[0] + bird.radius + half_gap[0]
+        for pipe in self.pipes:
+            for t in range(max(1, int(pipe.pos[0] - right) + 1), min(played, int(math.ceil(pipe.pos[0] - left)) - 1) + 1):
+                y = pipe.y(t)
+                if heights[t - 1] - bird.radius < y - half_gap[1] or heights[t - 1] + bird.radius > y + half_gap[1]:
+                    played, crashed = t, True
+                    break
+                    
+        bird.fly(played)
+        bird.pos[1] = heights[played - 1]
+        bird.vel = vels[played - 1]
+        self.ground.move(played)
+        for pipe in self.pipes:
+            # a point for every pipe the bird's x was swept past
+            if pipe.pos[0] > bird.pos[0] >= pipe.pos[0] - played:
+                coin.play()
+                self.score += 1
+            pipe.move(played)
+        if crashed:
+            bump.play()
+            bird.vel = 0
+            self.phase[1] = False
+            self.phase[2] = True
+            if self.score > self.best:
+                self.best = self.score
+                self.new = 'new'
+            else:
+                self.new = ''
+        return played
         
     def draw(self, canvas):
         background.draw(canvas, center, background.size)
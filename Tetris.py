@@ -1,4 +1,4 @@
-import simplegui, random, math
+import simplegui, random, math, time
 
 GRID = 24, 24
 SIZE = 20
@@ -7,11 +7,20 @@ class Image:
     def __init__(self, url, size):
         self.url = url
         self.size = size
-        self.image = simplegui.load_image(self.url)
+        self.image = None # loaded on first draw
+        self.centers = {} # frame -> its center on the sheet, 7 frames a row
+        
+    def call(self, pos, frame=0):
+        ''' return the draw_image call as (canvas method, arguments) '''
+        if self.image is None:
+            self.image = simplegui.load_image(self.url)
+        center = self.centers.get(frame)
+        if center is None:
+            center = self.centers[frame] = (self.size[0] * (frame % 7 + 0.5), self.size[1] * (frame // 7 + 0.5))
+        return 'draw_image', (self.image, center, self.size, pos, self.size)
         
     def draw(self, canvas, pos, frame=0):
-        center = [self.size[0] * (frame % 7 + 0.5), self.size[1] * (frame // 7 + 0.5)]
-        canvas.draw_image(self.image, center, self.size, pos, self.size)
+        canvas.draw_image(*self.call(pos, frame)[1])
         
 pitt = Image('https://dl.dropboxusercontent.com/u/10977446/pitt.png?dl=1', (480, 480))
 play = Image('https://dl.dropboxusercontent.com/u/10977446/play.png?dl=1', (480, 480))
@@ -28,11 +37,12 @@ hinge_color = {0:'rgba(255, 162, 179, 0.8)', 1:'rgba(255,  98,  98, 0.8)',
                6:'rgba(169, 141, 210, 0.8)'}
 width, height = GRID[0] * SIZE, GRID[1] * SIZE
 center = width / 2, height / 2
+FIELD = 0x3FF << 8 # row bits of the playfield columns 8..17, column x at bit x
 
-# five helper functions
+# eight helper functions
 def pos(x, y):
     ''' return pixel position for the center of grid(x,y) '''
-    return [(x - 0.5) * SIZE, (y - 0.5) * SIZE]
+    return ((x - 0.5) * SIZE, (y - 0.5) * SIZE)
 
 def hinge(x1, y1, x2, y2):
     ''' return the hinge line between two grids '''
@@ -54,15 +64,44 @@ def find_hinge(tiles):
                 found += hinge(tiles[i].x, tiles[i].y, tiles[j].x, tiles[j].y)
     return found
 
-def new_tetri(x, y):
+def shape_masks(offsets):
+    ''' return row bits of offsets from a pivot for 4 successive rotations,
+        as ((dy, bits), ...) with column dx at bit dx + 4 '''
+    shapes = []
+    for i in range(4):
+        rows = {}
+        for dx, dy in offsets:
+            rows[dy] = rows.get(dy, 0) | 1 << dx + 4
+        shapes.append(tuple(sorted(rows.items())))
+        offsets = [(-dy, dx) for dx, dy in offsets]
+    return shapes
+
+def rotations(offsets):
+    ''' return offsets, hinge lines and row bits of a shape in 4 successive
+        rotations, with the pivot at grid (0, 0) '''
+    masks = shape_masks(offsets)
+    table = []
+    for i in range(4):
+        lines = []
+        for j in range(len(offsets) - 1):
+            for k in range(j + 1, len(offsets)):
+                lines += hinge(offsets[j][0], offsets[j][1], offsets[k][0], offsets[k][1])
+        table.append((offsets, lines, masks[i]))
+        offsets = [(-dy, dx) for dx, dy in offsets]
+    return table
+
+def translate(lines, u, v):
+    ''' return hinge lines moved by u, v grids '''
+    return [[[p[0] + u * SIZE, p[1] + v * SIZE] for p in line] for line in lines]
+
+def new_tetri(x, y, rng=random):
     ''' return a random new tetrimino '''
-    shape = random.choice(tetri_dict.keys())
-    angle = random.randrange(4)
-    tiles = [Tile(x + i[0], y + i[1]) for i in tetri_dict[shape]]
-    for tile in tiles:
-        for i in range(angle):
-            tile.move(0, (x, y))
-    return Tetrimino(tiles, random.randrange(7))
+    shape = rng.choice(sorted(tetri_dict))
+    angle = rng.randrange(4)
+    tiles = [Tile(x + i[0], y + i[1]) for i in ROTATIONS[shape][angle][0]]
+    return Tetrimino(tiles, rng.randrange(7), shape, angle)
+
+ROTATIONS = dict([(shape, rotations(tetri_dict[shape])) for shape in tetri_dict])
 
 def sec2time(sec):
     m = sec // 60
@@ -70,8 +109,228 @@ def sec2time(sec):
     s = str(s) if s > 9 else '0' + str(s)
     return str(m) + ':' + s
 
+# placement search: the pile as a list of 24 row bits and as pieces, tuples
+# of (x, y) cells, so a candidate can be scored in another process
+WEIGHTS = {'height': -0.51, 'holes': -0.36, 'bumpiness': -0.18, 'points': 0.76}
+
+def pile_rows(pieces):
+    ''' return the row bits of pieces '''
+    rows = [0] * 24
+    for cells in pieces:
+        for x, y in cells:
+            rows[y] |= 1 << x
+    return rows
+
+def fits(shape, x, y, rows):
+    ''' whether shape with its pivot at (x, y) is inside the field and off rows '''
+    for dy, bits in shape:
+        bits = bits << x >> 4
+        if y + dy > 23 or bits & ~FIELD or bits & rows[y + dy]:
+            return False
+    return True
+
+def placements(rows, shape, angle, x, y):
+    ''' yield (turns, column, cells) for every landing of a tetrimino with its
+        pivot at (x, y): turns in place, a slide along row y, then a drop '''
+    table = ROTATIONS[shape]
+    seen = set([])
+    top = 0 # rows above the pile are empty, a drop skips them
+    while top < 24 and not rows[top]:
+        top += 1
+    for turns in range(4):
+        offsets, lines, mask = table[(angle + turns) % 4]
+        if not fits(mask, x, y, rows):
+            break
+        left, right = x, x
+        while fits(mask, left - 1, y, rows):
+            left -= 1
+        while fits(mask, right + 1, y, rows):
+            right += 1
+        for col in range(left, right + 1):
+            row = max(y, top - 1 - mask[-1][0])
+            while fits(mask, col, row + 1, rows):
+                row += 1
+            cells = tuple(sorted([(col + dx, row + dy) for dx, dy in offsets]))
+            if cells not in seen:
+                seen.add(cells)
+                yield turns, col, cells
+
+def fall_slowly(pieces):
+    ''' return how far each piece drops, dropping them one at a time until
+        none moves '''
+    rows = pile_rows(pieces)
+    drops = [0] * len(pieces)
+    order = sorted(range(len(pieces)), key=lambda i: -max([y for x, y in pieces[i]]))
+    moved = True
+    while moved:
+        moved = False
+        for i in order:
+            cells = [(x, y + drops[i]) for x, y in pieces[i]]
+            for x, y in cells:
+                rows[y] &= ~(1 << x)
+            drop = 0
+            while all([y + drop < 23 and not rows[y + drop + 1] >> x & 1 for x, y in cells]):
+                drop += 1
+            if drop:
+                moved = True
+                drops[i] += drop
+            for x, y in cells:
+                rows[y + drop] |= 1 << x
+    return drops
+
+def fall(pieces):
+    ''' return how far each piece drops until everything rests, in one pass:
+        pieces are taken bottom up along which rests on which, each landing
+        on the column surfaces of those below; pieces that interlock, each
+        under the other, fall back to fall_slowly '''
+    columns = {}
+    for i in range(len(pieces)):
+        for x, y in pieces[i]:
+            columns.setdefault(x, []).append((y, i))
+    above = [set([]) for cells in pieces] # pieces next up the columns
+    under = [0] * len(pieces)              # pieces next down the columns
+    for cells in columns.values():
+        cells.sort(reverse=True)
+        for k in range(len(cells) - 1):
+            i, j = cells[k][1], cells[k + 1][1]
+            if i != j and j not in above[i]:
+                above[i].add(j)
+                under[j] += 1
+    order = [i for i in range(len(pieces)) if not under[i]]
+    for i in order:
+        for j in above[i]:
+            under[j] -= 1
+            if not under[j]:
+                order.append(j)
+    if len(order) < len(pieces):
+        return fall_slowly(pieces)
+    surface = {} # column -> top row of the pieces already at rest
+    drops = [0] * len(pieces)
+    for i in order:
+        drop = min([surface.get(x, 24) - 1 - y for x, y in pieces[i]])
+        for x, y in pieces[i]:
+            surface[x] = min(surface.get(x, 24), y + drop)
+        drops[i] = drop
+    return drops
+
+def settle(pieces):
+    ''' drop pieces until none can fall, return them and their row bits '''
+    drops = fall(pieces)
+    pieces = [tuple([(x, y + drops[i]) for x, y in pieces[i]]) for i in range(len(pieces))]
+    return pieces, pile_rows(pieces)
+
+def cascade(pieces, rows):
+    ''' clear full rows, split pieces across them and let everything fall,
+        again while rows fill up; return pieces, rows and the points scored
+        as in points_update, doubling with every chain '''
+    points, chain = 0, 0
+    full = [y for y in range(24) if rows[y] == FIELD]
+    while full:
+        points += len(full) ** 2 * 2 ** chain
+        chain += 1
+        parts = []
+        for cells in pieces:
+            bands = {}
+            for x, y in cells:
+                if y not in full:
+                    band = len([row for row in full if row < y])
+                    bands.setdefault(band, []).append((x, y))
+            parts += [tuple(band) for band in bands.values()]
+        pieces, rows = settle(parts)
+        full = [y for y in range(24) if rows[y] == FIELD]
+    return pieces, rows, points
+
+def features(rows):
+    ''' return the weighted aggregate height, holes and bumpiness of row bits '''
+    covered, cells = 0, 0
+    tops = [0] * 10
+    for y in range(24):
+        if rows[y]:
+            new = rows[y] & ~covered
+            if new:
+                for x in range(8, 18):
+                    if new >> x & 1:
+                        tops[x - 8] = 24 - y
+                covered |= new
+            cells += bin(rows[y]).count('1')
+    height = sum(tops)
+    holes = height - cells # every cell is under the top of its column
+    bumpiness = sum([abs(tops[i] - tops[i + 1]) for i in range(9)])
+    return WEIGHTS['height'] * height + WEIGHTS['holes'] * holes + WEIGHTS['bumpiness'] * bumpiness
+
+def evaluate(task):
+    ''' value of landing cells on a pile, plus the best landing of the next
+        (shape, angle) if there is one; task is (pieces, rows, cells, after) '''
+    pieces, rows, cells, after = task
+    if min([y for x, y in cells]) <= 6: # game over
+        return -1e6
+    pieces, rows, points = pieces + [cells], rows[:], 0
+    for x, y in cells:
+        rows[y] |= 1 << x
+    if FIELD in rows:
+        pieces, rows, points = cascade(pieces, rows)
+    if after is None:
+        return WEIGHTS['points'] * points + features(rows)
+    best = -1e6
+    for turns, col, cells in placements(rows, after[0], after[1], 13, 4):
+        best = max(best, evaluate((pieces, rows, cells, None)))
+    return WEIGHTS['points'] * points + best
+
+def evaluate_batch(batch):
+    ''' evaluate several landings on one pile, which is sent once for them
+        all; batch is (pieces, rows, [(cells, after)]) '''
+    pieces, rows, landings = batch
+    return [evaluate((pieces, rows, cells, after)) for cells, after in landings]
+
+class Planner:
+    ''' placement search for tetris[0] with tetris[1] as lookahead, and the
+        hold slot as an alternative; candidates are first ranked by their own
+        landing, then refined with the lookahead in chunks until time is up '''
+    def __init__(self, budget=100, mapper=map, chunk=8, batches=1):
+        self.budget = budget   # milliseconds per piece, 0 for no limit
+        self.mapper = mapper   # map, or pool.map to refine candidates in parallel
+        self.chunk = chunk     # candidates refined between two clock checks
+        self.batches = batches # mapper tasks a chunk is split into, one per worker
+
+    def plan(self, game):
+        ''' return the keys that place tetris[0] best, [] if it cannot land '''
+        start = time.time()
+        pieces = [tuple([(t.x, t.y) for t in tetri.tiles]) for tetri in game.pile.tight]
+        rows = pile_rows(pieces)
+        options = [([], game.tetris[0], game.tetris.get(1))]
+        if 2 in game.tetris:
+            options.append((['h'], game.tetris[2], game.tetris.get(1)))
+        elif 1 in game.tetris:
+            options.append((['h'], game.tetris[1], None))
+        candidates = []
+        for keys, tetri, after in options:
+            x, y = (13, 4) if keys else (tetri.tiles[0].x, tetri.tiles[0].y)
+            after = after and (after.shape, after.angle)
+            for turns, col, cells in placements(rows, tetri.shape, tetri.angle, x, y):
+                slide = ['left'] * (x - col) + ['right'] * (col - x)
+                candidates.append((evaluate((pieces, rows, cells, None)), keys + ['up'] * turns + slide + ['down'], (cells, after)))
+        if not candidates:
+            return []
+        candidates.sort(key=lambda candidate: -candidate[0])
+        best, choice = None, candidates[0][1]
+        for i in range(0, len(candidates), self.chunk):
+            if self.budget and time.time() - start > self.budget / 1000.0:
+                break
+            chunk = candidates[i:i + self.chunk]
+            size = -(-len(chunk) // self.batches)
+            values = []
+            for batch in self.mapper(evaluate_batch, [(pieces, rows, [c[2] for c in chunk[j:j + size]])
+                                                      for j in range(0, len(chunk), size)]):
+                values += batch
+            for value, candidate in zip(values, chunk):
+                if best is None or value > best:
+                    best, choice = value, candidate[1]
+        return choice
+
 # three classes: Tile, Tetrimino, Game
-class Tile:
+class Tile(object):
+    __slots__ = ['x', 'y', 'pos']
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -96,26 +355,29 @@ class Tile:
             self.y = y
         self.pos = pos(self.x, self.y)
         
-    def can_move(self, how, center, pile, tetri):
-        scout = Tile(self.x, self.y)
-        scout.move(how, center)
-        if tetri.has(scout.x, scout.y):
-            return True
-        elif scout.x < 8 or scout.x > 17 or scout.y > 23:
-            return False
-        elif pile.has(scout.x, scout.y):
-            return False
-        else:
-            return True
-            
     def draw(self, canvas, color):
         tile.draw(canvas, self.pos, color)
         
 class Tetrimino:
-    def __init__(self, tiles, color):
+    def __init__(self, tiles, color, shape=None, angle=0):
         self.tiles = tiles
         self.color = color
-        self.hinge = find_hinge(tiles)
+        self.shape = shape # key of tetri_dict while whole, None once split by pop
+        self.angle = angle
+        if shape:
+            table = ROTATIONS[shape]
+            self.hinge = translate(table[angle][1], tiles[0].x, tiles[0].y)
+            self.shapes = [table[(angle + i) % 4][2] for i in range(4)]
+        else:
+            self.hinge = find_hinge(tiles)
+            self.shapes = shape_masks([(t.x - tiles[0].x, t.y - tiles[0].y) for t in tiles]) if tiles else []
+        self.mask()
+        
+    def mask(self):
+        ''' rebuild the occupied row bits of the tetrimino '''
+        self.rows = {}
+        for tile in self.tiles:
+            self.rows[tile.y] = self.rows.get(tile.y, 0) | 1 << tile.x
         
     def has(self, x, y):
         for tile in self.tiles:
@@ -128,16 +390,46 @@ class Tetrimino:
         v = y - self.tiles[0].y
         for tile in self.tiles:
             tile.jump(u, v)
-        self.hinge = find_hinge(self.tiles)
+        self.hinge = translate(self.hinge, u, v)
+        self.mask()
         
     def move(self, how):
-        for tile in self.tiles:
-            tile.move(how, (self.tiles[0].x, self.tiles[0].y))
-        self.hinge = find_hinge(self.tiles)
+        x, y = self.tiles[0].x, self.tiles[0].y
+        if how != 0:
+            for tile in self.tiles:
+                tile.move(how, (x, y))
+            self.hinge = translate(self.hinge, 0, 1) if how == 2 else translate(self.hinge, how, 0)
+        elif self.shape:
+            self.angle = (self.angle + 1) % 4
+            offsets, lines = ROTATIONS[self.shape][self.angle][:2]
+            for tile, i in zip(self.tiles, offsets):
+                tile.jump(x + i[0] - tile.x, y + i[1] - tile.y)
+            self.hinge = translate(lines, x, y)
+        else:
+            for tile in self.tiles:
+                tile.move(how, (x, y))
+            self.hinge = find_hinge(self.tiles)
+        if how == 0:
+            self.shapes = self.shapes[1:] + self.shapes[:1]
+        self.mask()
             
     def can_move(self, how, pile):
-        for tile in self.tiles:
-            if not tile.can_move(how, (self.tiles[0].x, self.tiles[0].y), pile, self):
+        x, y = self.tiles[0].x, self.tiles[0].y
+        if how == 0:
+            return self.fits(self.shapes[1], x, y, pile)
+        elif how == 2:
+            return self.fits(self.shapes[0], x, y + 1, pile)
+        else:
+            return self.fits(self.shapes[0], x + how, y, pile)
+        
+    def fits(self, shape, x, y, pile):
+        ''' whether shape with its pivot at (x, y) stays in the playfield
+            and off the pile, not counting cells of the tetrimino itself '''
+        for dy, bits in shape:
+            row = y + dy
+            bits = bits << x >> 4
+            if row > 23 or bits & ~FIELD or \
+               bits & pile.row_mask.get(row, 0) & ~self.rows.get(row, 0):
                 return False
         return True
     
@@ -154,6 +446,11 @@ class Tetrimino:
                Tetrimino(lower, self.color), \
                Tetrimino(mid, self.color+7)
             
+    def calls(self):
+        ''' return the canvas calls of draw() as (canvas method, arguments) '''
+        calls = [('draw_polyline', (hinge, 2, hinge_color[self.color % 7])) for hinge in self.hinge]
+        return calls + [tile.call(t.pos, self.color) for t in self.tiles]
+            
     def draw(self, canvas):
         for hinge in self.hinge:
             canvas.draw_polyline(hinge, 2, hinge_color[self.color % 7])
@@ -166,42 +463,47 @@ class Pile:
         self.loose = set([]) # tetriminos can fall
         self.trash = set([]) # tetriminos to remove
         self.row_tetri = {}  # tetriminos on a row
-        self.row_colmn = {}  # occupied grids on a row
+        self.row_mask = {}   # occupied grids on a row, column x at bit x
         self.full_rows = set([])
         self.last_full = 0
+        self.ticks = 0 # settle steps taken by down()
+        self.layer = None # canvas calls that draw tight, None once it changed
         
     def has(self, x, y):
-        return y in self.row_colmn and x in self.row_colmn[y]
+        return self.row_mask.get(y, 0) >> x & 1 == 1
         
     def fulls_add(self, row):
-        if len(self.row_colmn[row]) == 10:
+        if self.row_mask[row] == FIELD:
             self.full_rows.add(row)
             if self.last_full < row:
                 self.last_full = row
         
     def add(self, tetri):
+        self.layer = None
         tetri.color -= 7
         self.tight.add(tetri)
         for tile in tetri.tiles:
             col, row = tile.x, tile.y
-            if row in self.row_colmn:
+            if row in self.row_mask:
                 self.row_tetri[row].add(tetri)
-                self.row_colmn[row].add(col)
+                self.row_mask[row] |= 1 << col
                 self.fulls_add(row)
             else:
                 self.row_tetri[row] = set([tetri])
-                self.row_colmn[row] = set([col])
+                self.row_mask[row] = 1 << col
                 
     def pop(self, tetri):
+        self.layer = None
         tetri.color += 7
         self.tight.discard(tetri)
         self.loose.add(tetri)
         for tile in tetri.tiles:
             col, row = tile.x, tile.y
             self.row_tetri[row].discard(tetri)
-            self.row_colmn[row].discard(col)
+            self.row_mask[row] &= ~(1 << col)
 
     def pop_fulls(self):
+        self.layer = None
         for row in self.full_rows:
             for tetri in self.row_tetri[row]:
                 self.tight.discard(tetri)
@@ -214,7 +516,7 @@ class Pile:
                             self.row_tetri[tile.y].add(new_tetri)
                 self.trash.add(mid)
             self.row_tetri.pop(row)
-            self.row_colmn.pop(row)
+            self.row_mask.pop(row)
             
     def find_loose(self):
         ''' scan tight for loose '''
@@ -227,21 +529,51 @@ class Pile:
         for tetri in temp:
             self.pop(tetri)
             
+    def settle(self):
+        ''' drop every piece to rest at once, see fall() '''
+        tetris = list(self.tight | self.loose)
+        drops = fall([[(tile.x, tile.y) for tile in tetri.tiles] for tetri in tetris])
+        moved = [(tetri, drop) for tetri, drop in zip(tetris, drops) if drop]
+        for tetri, drop in moved:
+            if tetri in self.tight:
+                self.pop(tetri)
+        for tetri, drop in moved:
+            tetri.jump_to(tetri.tiles[0].x, tetri.tiles[0].y + drop)
+        for tetri in list(self.loose):
+            self.loose.discard(tetri)
+            self.add(tetri)
+
     def down(self):
-        ''' loose down and scan loose for tight'''
+        ''' move all loose down a row, then move to tight in one batch those
+            resting on tight, including on pieces landing in the same batch '''
+        self.ticks += 1
         for tetri in self.loose:
             tetri.move(2)
-            if not tetri.can_move(2, self):
-                self.loose.discard(tetri)
+        landed = set([])
+        found = True
+        while found:
+            found = [tetri for tetri in self.loose - landed if not tetri.can_move(2, self)]
+            for tetri in found:
                 self.add(tetri)
+            landed.update(found)
+        self.loose -= landed
 
     def draw(self, canvas):
-        for pile in [self.tight, self.loose, self.trash]:
+        # simplegui has no offscreen canvas to keep tight in, so keep the
+        # calls that draw it instead and replay them until tight changes
+        if self.layer is None:
+            self.layer = []
+            for tetri in self.tight:
+                self.layer += tetri.calls()
+        for name, args in self.layer:
+            getattr(canvas, name)(*args)
+        for pile in [self.loose, self.trash]:
             for tetri in pile:
                 tetri.draw(canvas)
 
 class Game:
-    def __init__(self):
+    def __init__(self, rng=random):
+        self.rng = rng # draws the tetriminos
         self.tetris = {}
         self.pile = Pile()
         self.time = 0
@@ -251,6 +583,10 @@ class Game:
         self.points = []
         self.move_dict = {}
         self.best = 0
+        self.planner = Planner()
+        self.autopilot = False
+        self.planned = None # tetrimino the autopilot has placed
+        self.instant = False # resolve chain reactions at once, not in time3 ticks
         self.time1 = simplegui.create_timer(500, self.tetri_down)
         self.time2 = simplegui.create_timer( 20, self.tetri_down)
         self.time3 = simplegui.create_timer(120, self.pile_update)
@@ -265,7 +601,7 @@ class Game:
         self.frame.start()
         
     def start(self):
-        self.tetris = {0: new_tetri(13, 4), 1: new_tetri(21, 4)}
+        self.tetris = {0: new_tetri(13, 4, self.rng), 1: new_tetri(21, 4, self.rng)}
         self.pile = Pile()
         self.time = 7 * 60
         self.state = 1
@@ -292,7 +628,9 @@ class Game:
     def tetri_down(self):
         if self.state == 1:
             if 1 not in self.tetris:
-                self.tetris[1] = new_tetri(21, 4)
+                self.tetris[1] = new_tetri(21, 4, self.rng)
+            if self.autopilot and self.planned is not self.tetris[0]:
+                self.pilot()
             if self.tetris[0].can_move(2, self.pile):
                 self.tetris[0].move(2)
             else:
@@ -303,7 +641,9 @@ class Game:
                 self.tetris[0] = self.tetris.pop(1)
                 self.tetris[0].jump_to(13, 4)
                 self.tetris[0].color += 7
-                if self.pile.full_rows:
+                if self.pile.full_rows and self.instant:
+                    self.resolve()
+                elif self.pile.full_rows:
                     self.time1.stop()
                     self.time2.stop()
                     self.time3.start()
@@ -324,6 +664,15 @@ class Game:
                 self.time3.stop()
                 self.time1.start()
                 
+    def resolve(self):
+        ''' the whole chain reaction in one step, scored like pile_update '''
+        while self.pile.full_rows:
+            self.pile.pop_fulls()
+            self.points_update()
+            self.pile.trash = set([])
+            self.pile.settle()
+        self.chain = 0
+            
     def points_update(self):
         pts = len(self.pile.full_rows) ** 2 * 2 ** self.chain
         pos = [213, 20 * (self.pile.full_rows.pop() - 1)]
@@ -349,6 +698,29 @@ class Game:
                     if self.move_dict[i] % 7 == 2 and self.tetris[0].can_move(i, self.pile):
                         self.tetris[0].move(i)
                     
+    def act(self, key):
+        ''' one discrete input: a turn, a one column slide, a drop to the
+            landing row or a hold '''
+        if key == 'up':
+            self.rotate()
+        elif key == 'h':
+            self.hold()
+        elif key == 'down':
+            while self.tetris[0].can_move(2, self.pile):
+                self.tetris[0].move(2)
+        else:
+            how = -1 if key == 'left' else 1
+            if self.tetris[0].can_move(how, self.pile):
+                self.tetris[0].move(how)
+
+    def pilot(self):
+        ''' place tetris[0] with the planner's keys '''
+        for key in self.planner.plan(self):
+            self.act(key)
+        if 1 not in self.tetris: # held into an empty slot
+            self.tetris[1] = new_tetri(21, 4, self.rng)
+        self.planned = self.tetris[0]
+
     def hold(self):
         if 2 in self.tetris:
             self.tetris[2], self.tetris[0] = self.tetris[0], self.tetris[2]
@@ -379,6 +751,8 @@ class Game:
                 self.move_dict[1] = 1
             if key == simplegui.KEY_MAP['h']:
                 self.hold()
+            if key == simplegui.KEY_MAP['b']:
+                self.autopilot = not self.autopilot
 
     def keyup(self, key):
         if self.state == 1 and not self.time3.is_running():
@@ -390,9 +764,25 @@ class Game:
             if key == simplegui.KEY_MAP['right']:
                 self.move_dict[1] = 0
             
-    def draw(self, canvas):
-        # update left or right control
+    def update(self):
+        ''' one frame of game state: left or right control, points floating
+            up, and the oldest finished points added to score and best '''
         self.move()
+        if self.points:
+            temp = False
+            for i in self.points:
+                if i[2] < 70:
+                    i[2] += 1
+                    i[1][1] -= 1
+                else:
+                    temp = True
+            if temp:
+                self.score += self.points.pop(0)[0]
+                if self.score > self.best:
+                    self.best = self.score
+            
+    def draw(self, canvas):
+        self.update()
         
         # draw pile
         self.pile.draw(canvas)
@@ -432,20 +822,10 @@ class Game:
         canvas.draw_text(str(self.score),     (213, 14), 12, 'White', 'sans-serif')
         canvas.draw_text(str(self.best),      (306, 14), 12, 'White', 'sans-serif')
         
-        # draw points just scored, update total score and best
-        if self.points:
-            temp = False
-            for i in self.points:
-                if i[2] < 70:
-                    i[2] += 1
-                    i[1][1] -= 1
-                    canvas.draw_text('+' + str(i[0]), i[1], 16, 'White', 'sans-serif')
-                else:
-                    temp = True
-            if temp:
-                self.score += self.points.pop(0)[0]
-                if self.score > self.best:
-                    self.best = self.score
+        # draw points just scored
+        for i in self.points:
+            if i[2] <= 70:
+                canvas.draw_text('+' + str(i[0]), i[1], 16, 'White', 'sans-serif')
         
 game = Game()
 game.run()
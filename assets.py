@@ -0,0 +1,186 @@
+''' Local cache for the images and sounds of the games.
+
+The game files point at Dropbox links, many of them dead now. An Assets
+object wraps a simplegui module so that load_image and load_sound find each
+URL in a content-addressed cache directory first: files are stored under
+their SHA-256 and an index maps URLs to them. A URL is fetched at most once,
+identical URLs share one image, and every load is timed. With the cache
+filled, the games start without touching the network.
+
+    python assets.py preload            # fetch every URL of the game files
+    python assets.py add URL FILE       # a local copy for a dead URL
+    python assets.py list
+    python assets.py check              # load the cached images, needs SimpleGUICS2Pygame
+'''
+import os, re, sys, json, time, types, hashlib, argparse, threading
+import urllib.parse, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE = os.path.join(HERE, '.asset_cache')
+GAME_FILES = ['2048_Softcore.py', '2048_Hardcore.py', 'Tetris.py', 'Flappy_Bird.py']
+URL = re.compile(r"'(https?://[^']+)'")
+
+class Cache:
+    ''' files named by the SHA-256 of their content, and a URL index '''
+    def __init__(self, root=CACHE):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        self.index = {} # url -> file name under root
+        self.lock = threading.Lock() # preload puts from several threads
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as index:
+                self.index = json.load(index)
+
+    def path(self, url):
+        ''' return the cached file of url, None if there is none '''
+        if url in self.index:
+            return os.path.join(self.root, self.index[url])
+
+    def put(self, url, data):
+        ''' store data as the content of url, return its file '''
+        digest = hashlib.sha256(data).hexdigest()
+        name = os.path.join(digest[:2], digest + os.path.splitext(urllib.parse.urlparse(url).path)[1])
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path + '.part', 'wb') as part:
+                part.write(data)
+            os.rename(path + '.part', path)
+        with self.lock:
+            self.index[url] = name
+            with open(self.index_path + '.part', 'w') as index:
+                json.dump(self.index, index, indent=1, sort_keys=True)
+            os.rename(self.index_path + '.part', self.index_path)
+        return path
+
+    def fetch(self, url, timeout=10):
+        ''' download url into the cache, return its file '''
+        return self.put(url, urllib.request.urlopen(url, timeout=timeout).read())
+
+class Assets:
+    ''' a simplegui module over base that loads images and sounds from the
+        cache, fetching what is missing unless offline '''
+    def __init__(self, base, cache=None, offline=False):
+        self.base = base
+        self.cache = cache or Cache()
+        self.offline = offline
+        self.paths = {}   # url -> local file, or the url if it cannot be had
+        self.images = {}  # url -> image, shared
+        self.timings = [] # (url, where from, seconds)
+        self.module = types.ModuleType('simplegui')
+        self.module.__dict__.update(dict([(k, v) for k, v in vars(base).items() if not k.startswith('__')]))
+        self.module.load_image = self.load_image
+        self.module.load_sound = self.load_sound
+
+    def resolve(self, url):
+        ''' return the local file of url and where it came from '''
+        if url in self.paths:
+            return self.paths[url], 'memory'
+        path, source = self.cache.path(url), 'cache'
+        if path is None and not self.offline:
+            try:
+                path, source = self.cache.fetch(url), 'network'
+            except (OSError, ValueError):
+                pass
+        if path is None:
+            path, source = url, 'missing'
+        self.paths[url] = path
+        return path, source
+
+    def timed(self, url, load):
+        start = time.time()
+        path, source = self.resolve(url)
+        if source != 'missing':
+            # backends take URLs only, SimpleGUICS2Pygame fails on bare paths
+            path = urllib.parse.urljoin('file:', urllib.request.pathname2url(os.path.abspath(path)))
+        loaded = load(path)
+        self.timings.append((url, source, time.time() - start))
+        return loaded
+
+    def load_image(self, url):
+        if url not in self.images:
+            self.images[url] = self.timed(url, self.base.load_image)
+        return self.images[url]
+
+    def load_sound(self, url):
+        # a sound is one channel, so every call gets its own from one file
+        return self.timed(url, self.base.load_sound)
+
+    def report(self, out=sys.stderr):
+        ''' print every load with where it came from and how long it took '''
+        for url, source, seconds in self.timings:
+            out.write('%8.1f ms  %-7s  %s\n' % (1000 * seconds, source, url))
+        out.write('%d loads, %.1f ms\n' % (len(self.timings), 1000 * sum([t[2] for t in self.timings])))
+
+def game_urls():
+    ''' return the asset URLs of the game files, first seen first '''
+    urls = []
+    for name in GAME_FILES:
+        with open(os.path.join(HERE, name)) as source:
+            urls += [url for url in URL.findall(source.read()) if url not in urls]
+    return urls
+
+def preload(cache, jobs):
+    ''' fetch every game URL that is not cached yet, in parallel '''
+    def fetch(url):
+        start = time.time()
+        try:
+            cache.fetch(url)
+            return url, 'fetched', time.time() - start
+        except (OSError, ValueError) as error:
+            return url, 'failed (%s)' % error, time.time() - start
+
+    missing = [url for url in game_urls() if not cache.path(url)]
+    start = time.time()
+    with ThreadPoolExecutor(jobs) as pool:
+        for url, result, seconds in pool.map(fetch, missing):
+            print('%8.1f ms  %s  %s' % (1000 * seconds, url, result))
+    print('%d of %d URLs were missing, %.1f s' % (len(missing), len(game_urls()), time.time() - start))
+
+def check(cache):
+    ''' load every cached image of the game files through SimpleGUICS2Pygame,
+        return the URLs of those that come out empty '''
+    import SimpleGUICS2Pygame.simpleguics2pygame as simplegui
+    loader = Assets(simplegui, cache, offline=True)
+    empty = []
+    for url in game_urls():
+        sound = os.path.splitext(urllib.parse.urlparse(url).path)[1] in ('.mp3', '.ogg', '.wav')
+        if cache.path(url) and not sound:
+            image = loader.load_image(url)
+            print('%4d x %-4d %s' % (image.get_width(), image.get_height(), url))
+            if not image.get_width():
+                empty.append(url)
+    return empty
+
+def main():
+    parser = argparse.ArgumentParser(description='Local cache for the images and sounds of the games.')
+    parser.add_argument('--cache', default=CACHE)
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    pre = commands.add_parser('preload', help='fetch every asset URL of the game files')
+    pre.add_argument('-j', '--jobs', type=int, default=8)
+    add = commands.add_parser('add', help='use a local file as the content of a URL')
+    add.add_argument('url')
+    add.add_argument('file')
+    commands.add_parser('list', help='show the URLs of the game files and their cached files')
+    commands.add_parser('check', help='load every cached image through SimpleGUICS2Pygame')
+    args = parser.parse_args()
+
+    cache = Cache(args.cache)
+    if args.command == 'preload':
+        preload(cache, args.jobs)
+    elif args.command == 'add':
+        with open(args.file, 'rb') as data:
+            print(cache.put(args.url, data.read()))
+    elif args.command == 'check':
+        empty = check(cache)
+        print('%d cached images came out empty' % len(empty))
+        sys.exit(1 if empty else 0)
+    else:
+        for url in game_urls():
+            print('%-66s %s' % (url, cache.path(url) or '-'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+''' Benchmarks for the headless games.
+
+    python bench.py sizes     # 2048 move throughput and bot cost, 4 x 4 to 8 x 8
+    python bench.py memory    # bytes and allocations per board of tiles
+    python bench.py planner   # Tetris placement search, serial and in a pool
+    python bench.py draw      # Tetris pile drawing with and without the layer
+    python bench.py flappy    # Flappy Bird frames, Game objects vs NumPy population
+    python bench.py pilot     # Flappy Bird autopilot decisions, tables vs a rule
+'''
+import time, random, argparse, tracemalloc, multiprocessing
+
+import headless
+
+def bench_sizes(args):
+    module = headless.load('2048_Softcore.py')
+    print('size     moves/sec  greedy ms/move')
+    for size in range(args.min_size, args.max_size + 1):
+        game = module.Game(random.Random(0), size)
+        game.instant = True
+        game.start()
+
+        # random play, a new game whenever one ends
+        moves = 0
+        start = time.time()
+        while time.time() - start < args.seconds:
+            for how in headless.random_policy(game):
+                if game.is_moved(game.grid, how, True):
+                    game.commit_move()
+                    game.finish_moving()
+                    moves += 1
+                    break
+            else:
+                game.start()
+        seconds = time.time() - start
+
+        # one greedy bot decision, timed over the positions that follow
+        spent = 0.0
+        for i in range(args.decisions):
+            start = time.time()
+            how = game.greedy_move()
+            spent += time.time() - start
+            if not how:
+                game.start()
+            elif game.is_moved(game.grid, how, True):
+                game.commit_move()
+                game.finish_moving()
+        print('%dx%d %13.0f %15.3f' % (size, size, moves / seconds, 1000 * spent / args.decisions))
+
+class DictTile:
+    ''' a tile as the games stored it before __slots__: attribute dict, list pos '''
+    def __init__(self, x, y, pos, **attributes):
+        self.x = x
+        self.y = y
+        self.pos = list(pos)
+        self.__dict__.update(attributes)
+
+def measure(make, count):
+    ''' return bytes and allocated blocks per object built by make() '''
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    boards = [make() for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    return (float(sum([stat.size_diff for stat in stats])) / count,
+            float(sum([stat.count_diff for stat in stats])) / count)
+
+def bench_memory(args):
+    g2048 = headless.load('2048_Softcore.py')
+    tetris = headless.load('Tetris.py')
+
+    def grid(size, tile):
+        return [[tile(x, y) for y in range(size)] for x in range(size)]
+
+    def field(tile):
+        return [tile(x, y) for x in range(8, 18) for y in range(4, 24)]
+
+    boards = [
+        ('2048 4x4', lambda: grid(4, lambda x, y: DictTile(x, y, (x * 100 + 95, y * 100 + 95),
+                                                          value=2, size=50, bump=0)),
+                     lambda: grid(4, lambda x, y: g2048.Tile(x, y, 2))),
+        ('2048 8x8', lambda: grid(8, lambda x, y: DictTile(x, y, (x * 100 + 95, y * 100 + 95),
+                                                          value=2, size=50, bump=0)),
+                     lambda: grid(8, lambda x, y: g2048.Tile(x, y, 2))),
+        ('Tetris 10x20', lambda: field(lambda x, y: DictTile(x, y, tetris.pos(x, y))),
+                         lambda: field(tetris.Tile)),
+    ]
+    print('board          dict bytes  blocks   slots bytes  blocks')
+    for name, before, after in boards:
+        print('%-12s %12.0f %7.1f %13.0f %7.1f' % (
+            (name,) + measure(before, args.count) + measure(after, args.count)))
+
+def bench_planner(args):
+    tetris = headless.load('Tetris.py')
+    print('mapper   pieces  ms/piece  points')
+    runs = [('map', None), ('pool', multiprocessing.Pool(args.jobs, headless.load, ('Tetris.py',)))]
+    for name, pool in runs:
+        tetris.random.seed(args.seed)
+        game = tetris.Game()
+        # a pool gets a chunk of 64 candidates, one batch per worker, so the pile is sent once to each
+        game.planner = tetris.Planner(args.budget, pool.map if pool else map, 64 if pool else 8, args.jobs if pool else 1)
+        game.autopilot = True
+        game.start()
+
+        # time only the planning, ticks in between run at full speed
+        pieces, spent, pilot = 0, 0.0, game.pilot
+        while game.state == 1 and pieces < args.pieces:
+            if game.time3.is_running():
+                game.pile_update()
+                continue
+            if game.planned is not game.tetris[0]:
+                start = time.time()
+                pilot()
+                spent += time.time() - start
+                pieces += 1
+            game.tetri_down()
+        points = game.score + sum([point[0] for point in game.points])
+        print('%-6s %8d %9.1f %7d' % (name, pieces, 1000 * spent / max(pieces, 1), points))
+        if pool:
+            pool.close()
+            pool.join()
+
+class NullCanvas:
+    ''' counts canvas calls and draws nothing '''
+    def __init__(self):
+        self.calls = 0
+
+    def call(self, *args):
+        self.calls += 1
+
+    draw_image = draw_polyline = call
+
+def bench_draw(args):
+    tetris = headless.load('Tetris.py')
+    boards = []
+    for seed in range(args.boards):
+        game = tetris.Game(random.Random(seed))
+        game.planner = tetris.Planner(0)
+        game.autopilot = True
+        game.instant = True
+        game.start()
+        for i in range(args.pieces):
+            game.tetri_down()
+        boards.append(game)
+
+    # a spectator page draws every board each frame, a piece lands on
+    # one of them every few frames; the rest of the frame is the same
+    print('pile        ms/frame  calls/frame')
+    for name in ['tetriminos', 'layer']:
+        canvas = NullCanvas()
+        start = time.time()
+        for frame in range(args.frames):
+            for game in boards:
+                if name == 'layer':
+                    if frame % args.landing == 0:
+                        game.pile.layer = None
+                    game.pile.draw(canvas)
+                else:
+                    for pile in [game.pile.tight, game.pile.loose, game.pile.trash]:
+                        for tetri in pile:
+                            tetri.draw(canvas)
+        seconds = time.time() - start
+        print('%-10s %9.3f %12.0f' % (name, 1000 * seconds / args.frames, float(canvas.calls) / args.frames))
+
+def bench_flappy(args):
+    import flappy_sim
+    flappy = flappy_sim.flappy
+
+    # all on one course, every bird flaps when it sinks below the gap center plus its own offset
+    rng = random.Random(args.seed)
+    offsets = [rng.randrange(-10, 30) for i in range(args.birds)]
+    print('engine        birds  bird-frames/sec  mean score')
+    for skip in sorted(set([1, args.skip])):
+        # a decision every skip frames, the game moved on by skip frames at once
+        games = []
+        for offset in offsets[:args.objects]:
+            game = flappy.Game(args.seed)
+            game.start()
+            game.phase[0], game.phase[1] = False, True
+            games.append((game, offset))
+        frames = 0
+        start = time.time()
+        for frame in range(0, args.frames, skip):
+            for game, offset in games:
+                if game.phase[1]:
+                    pipe = min([pipe for pipe in game.pipes if pipe.pos[0] + 20 > 170], key=lambda pipe: pipe.pos[0])
+                    if game.bird.pos[1] > pipe.pos[1] + offset and game.bird.vel > 0:
+                        game.bird.flap()
+                    game.advance(skip)
+                    frames += skip
+        seconds = time.time() - start
+        print('%-10s %8d %16.0f %11.2f' % ('objects/%d' % skip, len(games), frames / seconds,
+                                           float(sum([game.score for game, offset in games])) / len(games)))
+
+    for skip in sorted(set([1, args.skip])):
+        population = flappy_sim.Population(args.birds, flappy.course(args.seed))
+        limits = -flappy_sim.np.array(offsets, dtype=float)
+        start = time.time()
+        for frame in range(0, args.frames, skip):
+            seen = population.observe()
+            if not population.step((seen[:, 1] < limits) & (seen[:, 2] > 0), skip):
+                break
+        seconds = time.time() - start
+        print('%-10s %8d %16.0f %11.2f' % ('numpy/%d' % skip, args.birds, population.frames.sum() / seconds,
+                                           population.score.mean()))
+
+def bench_pilot(args):
+    import flappy_pilot
+
+    start = time.time()
+    tables = flappy_pilot.load()
+    print('tables: %d bytes, %.2f s to load or build' % (
+        sum([len(table) * table.itemsize for table in tables]), time.time() - start))
+
+    def rule(game):
+        # flap when sinking past 20 px below the gap center, a flap rises 45
+        pipe = flappy_pilot.next_pipe(game.pipes, game.bird)
+        return game.bird.pos[1] > pipe.pos[1] + 20 and game.bird.vel > 0
+
+    print('pilot        games  decisions/sec  worst ms  mean score  max score  full games')
+    for name, policy in [('rule', rule), ('tables', flappy_pilot.Pilot(tables))]:
+        calls = [0, 0.0, 0.0] # decisions, seconds in them, the longest one
+        def timed(game):
+            start = time.time()
+            flap = policy(game)
+            spent = time.time() - start
+            calls[0] += 1
+            calls[1] += spent
+            calls[2] = max(calls[2], spent)
+            return flap
+        flights = [flappy_pilot.fly(timed, seed, args.frames) for seed in range(args.seed, args.seed + args.games)]
+        scores = [score for score, frames in flights]
+        print('%-10s %7d %14.0f %9.3f %11.2f %10d %11d' % (name, args.games, calls[0] / calls[1], 1000 * calls[2],
+                                                            float(sum(scores)) / len(scores), max(scores),
+                                                            len([frames for score, frames in flights if frames == args.frames])))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for the headless games.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    sizes = commands.add_parser('sizes', help='2048 move throughput by board size')
+    sizes.add_argument('--min-size', type=int, default=4)
+    sizes.add_argument('--max-size', type=int, default=8)
+    sizes.add_argument('--seconds', type=float, default=2.0, help='random play per size')
+    sizes.add_argument('--decisions', type=int, default=200, help='greedy bot moves timed per size')
+    sizes.set_defaults(run=bench_sizes)
+    memory = commands.add_parser('memory', help='tracemalloc bytes per board, dict vs slots tiles')
+    memory.add_argument('--count', type=int, default=2000, help='boards built per measurement')
+    memory.set_defaults(run=bench_memory)
+    planner = commands.add_parser('planner', help='Tetris autopilot decisions, map vs process pool')
+    planner.add_argument('--pieces', type=int, default=100)
+    planner.add_argument('--seed', type=int, default=0)
+    planner.add_argument('--budget', type=int, default=0, help='milliseconds per piece, 0 for no limit')
+    planner.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count())
+    planner.set_defaults(run=bench_planner)
+    draw = commands.add_parser('draw', help='Tetris spectator frames, pile drawn per tetrimino vs layer')
+    draw.add_argument('--boards', type=int, default=16)
+    draw.add_argument('--pieces', type=int, default=40, help='bot pieces dropped on each board')
+    draw.add_argument('--frames', type=int, default=300)
+    draw.add_argument('--landing', type=int, default=30, help='frames between pile changes')
+    draw.set_defaults(run=bench_draw)
+    flappy = commands.add_parser('flappy', help='Flappy Bird frames, one Game per bird vs a NumPy population')
+    flappy.add_argument('--birds', type=int, default=10000)
+    flappy.add_argument('--objects', type=int, default=200, help='birds flown as Game objects')
+    flappy.add_argument('--frames', type=int, default=2000)
+    flappy.add_argument('--seed', type=int, default=0)
+    flappy.add_argument('--skip', type=int, default=4, help='frames per step in the second runs')
+    flappy.set_defaults(run=bench_flappy)
+    pilot = commands.add_parser('pilot', help='Flappy Bird autopilot decisions, tables vs a rule')
+    pilot.add_argument('--games', type=int, default=20)
+    pilot.add_argument('--frames', type=int, default=10000, help='frames per game at most')
+    pilot.add_argument('--seed', type=int, default=0)
+    pilot.set_defaults(run=bench_pilot)
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+''' Flappy Bird autopilot from precomputed tables, needs NumPy to build them.
+
+The bird only ever has to know whether to flap now. Its velocity is always
+flap_vel + gravity * n for a whole n, and it only ever moves by whole steps
+of gravity, so relative to a gap center its state is a height step and a
+velocity step that the physics moves exactly. Every pipe after the first
+three is placed at the same x, so how far its gap has swayed depends on its
+vertical move scale and its x alone; the course only picks the gap center.
+
+- Per scale, the tables hold for each x of the next pipe and velocity step
+  the heights off its gap center from which the bird can get through it.
+  They are built backwards from the far side of the pipe: a state is in if
+  it is clear of the gap while the pipe is in the bird's way, and flapping
+  or not takes it to a state that is in a frame on. A height is in for any
+  fraction of a step the bird is off it, and clear of the ground under the
+  lowest gap there is.
+- A row of heights is stored as its span, and the holes in it for the few
+  rows of fast-swaying scales that have some.
+- In play the pilot takes an action that keeps the bird in the tables of the
+  next pipe, which gets it through that pipe. It favors one that also keeps
+  it in the tables of the pipe after, then the one further inside.
+- Out of the tables, as when the next gap lies far from the last, it flaps
+  if not flapping leaves the bird below them.
+
+The tables come to about 2.3 MB and take about 2 s to build, once: they are
+kept in .pilot_cache, in a file named by the physics they were built for. A
+decision is at most four row lookups.
+
+    python flappy_pilot.py -n 100        # build or load the tables, fly games
+'''
+import os, sys, math, time, array, struct, hashlib, argparse
+
+import headless
+
+flappy = headless.load('Flappy_Bird.py')
+
+RADIUS, BIRD_X = 10, 180  # Bird, and where Game.start puts it
+EPSILON = 1e-6            # px, heights this close to an edge count as out
+STEP = flappy.gravity     # px, a height step and a velocity step
+FLAP = int(round(flappy.flap_vel / STEP)) # velocity of a flap in steps
+SPEEDS = 131              # velocity steps, up to 10 px a frame
+LOW = -3500               # height steps off the gap center, higher than the bird flies
+HIGH = int(math.floor((flappy.height - flappy.ground_height - RADIUS - (flappy.gap_pos_max - 1) - EPSILON)
+                      / STEP)) - 1 # lowest height clear of the ground under any gap
+SCALES = range(-5, 5)     # vertical move scales, Course
+PLACED = int(3 * flappy.pipe_spacing - flappy.half_gap[0] - 1) # x of every pipe placed by Game.advance
+FARTHEST = 800            # x of the last still pipe of Game.start
+LEFT = BIRD_X - RADIUS - flappy.half_gap[0]  # the pipe is in the bird's way for LEFT < x < RIGHT
+RIGHT = BIRD_X + RADIUS + flappy.half_gap[0]
+FIRST = int(LEFT)         # x of the first row, past the pipe
+CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.pilot_cache')
+HEADER = struct.Struct('<I') # spans in the cache file, the holes follow them
+
+def last(scale):
+    ''' x of the last row of a scale, only still pipes start farther than PLACED '''
+    return FARTHEST if scale == 0 else PLACED
+
+def gap(scale, x):
+    ''' return the height steps the bird may take off the gap center of a pipe at x '''
+    sway = flappy.SWAYS[scale][PLACED - x]
+    return (int(math.ceil((sway - flappy.half_gap[1] + RADIUS + EPSILON) / STEP)),
+            int(math.floor((sway + flappy.half_gap[1] - RADIUS - EPSILON) / STEP)) - 1)
+
+def physics():
+    return 'v3 %r %r %r %r %d %d %d %d %d %d %d %s' % (
+        flappy.gravity, flappy.flap_vel, flappy.half_gap, [gap(scale, int(RIGHT) - 1) for scale in SCALES],
+        RADIUS, BIRD_X, LOW, HIGH, SPEEDS, PLACED, FARTHEST, sys.byteorder)
+
+def cache_path(root=CACHE):
+    return os.path.join(root, 'pilot-%s.bin' % hashlib.sha1(physics().encode()).hexdigest()[:12])
+
+def build_scale(np, scale, spans, holes):
+    ''' append the rows of a scale to spans, a low and high height each, and
+        to holes, the row, their count and a low and high height each '''
+    count = HIGH - LOW + 1
+    pad = SPEEDS # states padded out on both sides, so a frame's move never leaves the array
+    width = count + 2 * pad
+    inside, ahead = np.zeros((SPEEDS, width), dtype=bool), np.zeros((SPEEDS, width), dtype=bool)
+    inside[:, pad:pad + count] = True
+    for x in range(FIRST, last(scale) + 1):
+        if x > FIRST:
+            ahead, inside = inside, ahead
+            body = inside[:, pad:pad + count]
+            flat = ahead.reshape(-1)
+            body[:] = ahead[1, pad + 1 + FLAP:pad + 1 + FLAP + count] # a flap, the same from any speed
+            # not flapping moves speed s on by s + 1 + FLAP heights and to the next
+            # row, which is one row and one place further in the flat array whatever s is
+            body[:-1] |= np.lib.stride_tricks.as_strided(flat[width + pad + 1 + FLAP:], (SPEEDS - 1, count),
+                                                         ((width + 1) * flat.strides[0], flat.strides[0]))
+            if LEFT < x < RIGHT:
+                low, high = gap(scale, x)
+                body[:, :max(0, low - LOW)] = False
+                body[:, max(0, high - LOW + 1):] = False
+        body = inside[:, pad:pad + count]
+        found = body.any(axis=1)
+        low = body.argmax(axis=1)
+        high = count - 1 - body[:, ::-1].argmax(axis=1)
+        row = len(spans) // 2
+        for speed in range(SPEEDS):
+            spans.extend([low[speed] + LOW, high[speed] + LOW] if found[speed] else [1, 0])
+        for speed in np.flatnonzero(found & (body.sum(axis=1) != high - low + 1)):
+            edges = np.flatnonzero(np.diff(body[speed, low[speed]:high[speed] + 1].astype(np.int8))) + low[speed] + LOW
+            holes.extend([row + speed, len(edges) // 2] + [int(edge) + 1 if i % 2 == 0 else int(edge)
+                                                           for i, edge in enumerate(edges)])
+
+def build(out=sys.stderr):
+    ''' return the spans and holes of every scale '''
+    import numpy as np
+    spans, holes = array.array('h'), array.array('i')
+    for scale in SCALES:
+        start, row, hole = time.time(), len(spans) // 2, len(holes)
+        build_scale(np, scale, spans, holes)
+        out.write('scale %d: %d rows, %d with holes, %.2f s\n' % (
+            scale, len(spans) // 2 - row, len(rows_with_holes(holes[hole:])), time.time() - start))
+    return spans, holes
+
+def rows_with_holes(holes):
+    ''' return row -> its holes from a holes array '''
+    found, i = {}, 0
+    while i < len(holes):
+        count = holes[i + 1]
+        found[holes[i]] = [(holes[i + 2 + 2 * k], holes[i + 3 + 2 * k]) for k in range(count)]
+        i += 2 + 2 * count
+    return found
+
+def load(root=CACHE):
+    ''' return the tables, from the cache or built and cached '''
+    path = cache_path(root)
+    spans, holes = array.array('h'), array.array('i')
+    if os.path.exists(path):
+        with open(path, 'rb') as cached:
+            data = cached.read()
+        size = HEADER.unpack_from(data)[0]
+        spans.frombytes(data[HEADER.size:HEADER.size + size])
+        holes.frombytes(data[HEADER.size + size:])
+        return spans, holes
+    spans, holes = build()
+    if not os.path.isdir(root):
+        os.makedirs(root)
+    with open(path + '.part', 'wb') as cached:
+        cached.write(HEADER.pack(len(spans) * spans.itemsize))
+        cached.write(spans.tobytes())
+        cached.write(holes.tobytes())
+    os.rename(path + '.part', path)
+    return spans, holes
+
+class Pilot:
+    ''' a Game.pilot: flap or not from the tables, a few lookups a frame '''
+    def __init__(self, tables=None):
+        self.spans, holes = tables or load()
+        self.holes = rows_with_holes(holes)
+        self.first = {} # scale -> its first row
+        row = 0
+        for scale in SCALES:
+            self.first[scale] = row
+            row += (last(scale) - FIRST + 1) * SPEEDS
+
+    def row(self, pipe, speed):
+        ''' return the row for a pipe after its next move and a velocity step,
+            None where the tables do not cover the pipe '''
+        x, scale = pipe.pos[0] - 1, pipe.vertical_move_scale
+        if not FIRST <= x <= last(scale) or scale and pipe.moves + pipe.pos[0] != PLACED:
+            return None
+        return self.first[scale] + (x - FIRST) * SPEEDS + speed
+
+    def margin(self, row, height):
+        ''' return how many steps inside its row a height is, negative if out '''
+        for low, high in self.holes.get(row, ()):
+            if low <= height <= high:
+                return -1
+        return min(height - self.spans[2 * row], self.spans[2 * row + 1] - height)
+
+    def __call__(self, game):
+        bird = game.bird
+        pipes = sorted([pipe for pipe in game.pipes if pipe.pos[0] + flappy.half_gap[0] > bird.pos[0] - bird.radius],
+                       key=lambda pipe: pipe.pos[0])[:2]
+        choices, below = [], None
+        for flap, vel in [(False, bird.vel + STEP), (True, flappy.flap_vel + STEP)]:
+            speed = int(round((vel - flappy.flap_vel) / STEP))
+            rows = [self.row(pipe, speed) if speed < SPEEDS else None for pipe in pipes]
+            heights = [int(math.floor((bird.pos[1] + vel - pipe.vertical_center) / STEP)) for pipe in pipes]
+            inside = self.margin(rows[0], heights[0]) if rows[0] is not None else -1
+            if inside >= 0:
+                after = len(pipes) < 2 or rows[1] is None or self.margin(rows[1], heights[1]) >= 0
+                choices.append((after, inside, not flap, flap))
+            elif not flap and rows[0] is not None:
+                below = heights[0] > self.spans[2 * rows[0] + 1]
+        if choices:
+            return max(choices)[-1]
+        if below is None:
+            # where the tables do not reach, flap when sinking below the gap center
+            return bird.vel > 0 and bird.pos[1] > pipes[0].pos[1]
+        return below # out of the tables, flap if not flapping leaves the bird below its row
+
+def next_pipe(pipes, bird):
+    ''' return the nearest pipe the bird is not past yet '''
+    ahead = [pipe for pipe in pipes if pipe.pos[0] + flappy.half_gap[0] > bird.pos[0] - bird.radius]
+    return min(ahead, key=lambda pipe: pipe.pos[0])
+
+def fly(pilot, seed, frames):
+    ''' fly one game on the course of seed under pilot, return its score and
+        the frames it lasted '''
+    game = flappy.Game(seed)
+    game.pilot = pilot
+    game.start()
+    game.phase[0], game.phase[1] = False, True
+    for frame in range(frames):
+        game.update()
+        if not game.phase[1]:
+            break
+    return game.score, frame + 1
+
+def main():
+    parser = argparse.ArgumentParser(description='Flappy Bird autopilot from precomputed tables.')
+    parser.add_argument('-n', '--games', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0, help='game i flies the course of seed + i')
+    parser.add_argument('--frames', type=int, default=100000, help='frames per game at most')
+    args = parser.parse_args()
+
+    pilot = Pilot()
+    for seed in range(args.seed, args.seed + args.games):
+        score, frames = fly(pilot, seed, args.frames)
+        print('seed %d: %d points in %d frames' % (seed, score, frames))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+''' Flappy Bird physics for a population of birds at once, needs NumPy.
+
+Every bird flies the same pipe course, so the pipes are stepped once per
+frame in plain Python and the birds are arrays: height, velocity, alive,
+score and frames survived. A step is one frame of Game.update with the game
+in play, with the constants of Flappy_Bird.py; a bird that hits a pipe or
+the ground is dead at once instead of falling, and stays where it was.
+
+Courses of pipes are seeded, see Course in Flappy_Bird.py. load_course and
+save_course keep them in a cache directory by seed, with the state of their
+generator, so evaluations in other processes fly the very same pipes and
+extend the same stream.
+'''
+import os, json, random
+
+import numpy as np
+
+import headless
+
+flappy = headless.load('Flappy_Bird.py')
+
+X, RADIUS = 180, 10 # Bird in Game.start
+GROUND = flappy.height - flappy.ground_height
+CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.course_cache')
+
+def course_path(seed, root=CACHE):
+    return os.path.join(root, 'course-%d.json' % seed)
+
+def load_course(seed, root=CACHE):
+    ''' return the shared course of seed, read from the cache if it is there '''
+    if seed not in flappy.COURSES and os.path.exists(course_path(seed, root)):
+        with open(course_path(seed, root)) as cached:
+            data = json.load(cached)
+        rng = random.Random()
+        version, state, gauss = data['state']
+        rng.setstate((version, tuple(state), gauss))
+        flappy.COURSES[seed] = flappy.Course(rng, [tuple(pipe) for pipe in data['pipes']])
+    return flappy.course(seed)
+
+def save_course(seed, length=0, root=CACHE):
+    ''' draw the course of seed to at least length pipes and write it to the cache '''
+    course = load_course(seed, root)
+    if length:
+        course[length - 1]
+    if not os.path.isdir(root):
+        os.makedirs(root)
+    path = course_path(seed, root)
+    with open(path + '.part', 'w') as cached:
+        json.dump({'seed': seed, 'pipes': course.pipes, 'state': course.rng.getstate()}, cached)
+    os.rename(path + '.part', path)
+    return course
+
+class Population:
+    ''' count birds flying one course, a new one from the global random if
+        none is given, as Game does '''
+    def __init__(self, count, course=None):
+        self.course = course or flappy.course()
+        self.count = 0 # pipes taken from the course
+        self.y = np.full(count, flappy.height / 2, dtype=float)
+        self.vel = np.zeros(count)
+        self.alive = np.ones(count, dtype=bool)
+        self.score = np.zeros(count, dtype=np.int64)
+        self.frames = np.zeros(count, dtype=np.int64)
+        self.pipes = [flappy.Pipe([0, 0]), flappy.Pipe([0, 0]), flappy.Pipe([0, 0])] # a ring, as Game
+        self.first = 0
+        for pipe, x in zip(self.pipes, [500, 650, 800]):
+            self.place(pipe, x)
+
+    def place(self, pipe, x):
+        gap, scale = self.course[self.count]
+        self.count += 1
+        pipe.reset(x, gap, scale)
+
+    def step(self, flap=None, frames=1):
+        ''' advance frames frames with no input but flapping the birds where
+            flap is true first; return the number of birds still alive '''
+        alive = self.alive
+        if flap is not None:
+            self.vel[np.asarray(flap, dtype=bool) & alive] = flappy.flap_vel
+        while frames > 0:
+            front = self.pipes[self.first]
+            if front.pos[0] + flappy.half_gap[0] < 0:
+                self.place(front, self.pipes[self.first - 1].pos[0] + flappy.pipe_spacing)
+                self.first = (self.first + 1) % len(self.pipes)
+
+            # the pipes move once per stretch up to the next replacement,
+            # birds are checked against one only in the frames it is over them
+            played = min(frames, int(self.pipes[self.first].pos[0] + flappy.half_gap[0]) + 1)
+            left, right = X - RADIUS - flappy.half_gap[0], X + RADIUS + flappy.half_gap[0]
+            sweeps = [(pipe, pipe.pos[0] - X, pipe.pos[0] - right, pipe.pos[0] - left) for pipe in self.pipes]
+            for t in range(1, played + 1):
+                alive &= self.y + RADIUS <= GROUND
+                np.add(self.vel, flappy.gravity, out=self.vel, where=alive)
+                np.add(self.y, self.vel, out=self.y, where=alive)
+                for pipe, passed, first, last in sweeps:
+                    if t == passed:
+                        self.score += alive
+                    if first < t < last:
+                        y = pipe.y(t)
+                        alive &= ((self.y - RADIUS >= y - flappy.half_gap[1])
+                                  & (self.y + RADIUS <= y + flappy.half_gap[1]))
+                self.frames += alive
+            for pipe in self.pipes:
+                pipe.move(played)
+            frames -= played
+        return int(np.count_nonzero(alive))
+
+    def next_pipe(self):
+        ''' return the first pipe the birds have not cleared yet '''
+        for i in range(len(self.pipes)):
+            pipe = self.pipes[(self.first + i) % len(self.pipes)]
+            if pipe.pos[0] + flappy.half_gap[0] > X - RADIUS:
+                return pipe
+
+    def observe(self):
+        ''' return an (N, 3) array of what each bird sees: horizontal distance
+            to the next pipe, height of its gap center above the bird, velocity '''
+        pipe = self.next_pipe()
+        return np.column_stack([np.full(len(self.y), pipe.pos[0] - X, dtype=float), pipe.pos[1] - self.y, self.vel])
+
+    def run(self, policy, frames=None):
+        ''' step with flap = policy(self) until every bird is dead or frames
+            have passed, return the scores '''
+        frame = 0
+        while frames is None or frame < frames:
+            if not self.step(policy(self)):
+                break
+            frame += 1
+        return self.score
@@ -0,0 +1,313 @@
+''' Run the games without a browser.
+
+install() registers a null simplegui module: frames, labels, timers, images
+and sounds do nothing, so a game file can be imported and driven at batch
+speed. load() imports a game file by name under that backend. A Clock fires
+null timers in virtual time, so timer driven games like Tetris run as fast
+as the CPU allows.
+
+    python headless.py 2048 -n 100 --policy bot
+    python headless.py tetris -n 100 --policy bot
+'''
+import sys, os, types, time, random, argparse, collections, importlib.util
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+KEY_MAP = dict([('space', 32), ('left', 37), ('up', 38), ('right', 39), ('down', 40)]
+               + [(chr(c), c) for c in range(48, 58)]
+               + [(chr(c + 32), c) for c in range(65, 91)])
+DIRECTIONS = ['up', 'down', 'left', 'right']
+
+# null backend
+class Control:
+    ''' label, button or input box '''
+    def __init__(self, text=''):
+        self.text = text
+
+    def set_text(self, text):
+        self.text = text
+
+    def get_text(self):
+        return self.text
+
+class Frame:
+    def __init__(self, title, width, height, control_width=200):
+        self.title = title
+        self.size = (width, height)
+        self.handlers = {}
+        self.controls = []
+
+    def add_control(self, text):
+        self.controls.append(Control(text))
+        return self.controls[-1]
+
+    def add_button(self, text, handler, width=None):
+        return self.add_control(text)
+
+    def add_label(self, text, width=None):
+        return self.add_control(text)
+
+    def add_input(self, text, handler, width):
+        return self.add_control(text)
+
+    def set_draw_handler(self, handler):
+        self.handlers['draw'] = handler
+
+    def set_keydown_handler(self, handler):
+        self.handlers['keydown'] = handler
+
+    def set_keyup_handler(self, handler):
+        self.handlers['keyup'] = handler
+
+    def set_mouseclick_handler(self, handler):
+        self.handlers['click'] = handler
+
+    def set_mousedrag_handler(self, handler):
+        self.handlers['drag'] = handler
+
+    def set_canvas_background(self, color):
+        pass
+
+    def get_canvas_textwidth(self, text, size, face='serif'):
+        return 0
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+class Timer:
+    def __init__(self, interval, handler):
+        self.interval = interval
+        self.handler = handler
+        self.running = False
+        self.due = None # virtual time of the next tick, set by a Clock
+
+    def start(self):
+        if not self.running:
+            self.due = None
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def is_running(self):
+        return self.running
+
+class Canvas:
+    ''' draw handler argument that draws nothing '''
+    def draw(self, *args):
+        pass
+
+    draw_text = draw_line = draw_polyline = draw_polygon = draw_circle = draw_point = draw_image = draw
+
+class Image:
+    def __init__(self, url):
+        self.url = url
+
+    def get_width(self):
+        return 0
+
+    def get_height(self):
+        return 0
+
+class Sound:
+    def __init__(self, url):
+        self.url = url
+
+    def play(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def rewind(self):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+def backend():
+    ''' return a new null simplegui module '''
+    module = types.ModuleType('simplegui')
+    module.KEY_MAP = dict(KEY_MAP)
+    module.create_frame = Frame
+    module.create_timer = Timer
+    module.load_image = Image
+    module.load_sound = Sound
+    return module
+
+class Clock:
+    ''' virtual milliseconds for a list of null timers: step() jumps to the
+        next due timer and fires it, ties in list order '''
+    def __init__(self, timers):
+        self.now = 0.0
+        self.timers = timers
+
+    def step(self):
+        ''' fire the next due timer, False if none is running '''
+        for timer in self.timers:
+            if not timer.running:
+                timer.due = None
+            elif timer.due is None:
+                timer.due = self.now + timer.interval
+        running = [timer for timer in self.timers if timer.running]
+        if not running:
+            return False
+        timer = min(running, key=lambda timer: timer.due)
+        self.now = timer.due
+        timer.due += timer.interval
+        timer.handler()
+        return True
+
+def install():
+    ''' register the null backend as simplegui unless one is already there '''
+    if 'simplegui' not in sys.modules:
+        sys.modules['simplegui'] = backend()
+    return sys.modules['simplegui']
+
+def load(name):
+    ''' import a game file such as '2048_Softcore.py' and return the module,
+        registered under its file name so process pools can pickle its
+        functions '''
+    install()
+    path = os.path.join(HERE, name)
+    spec = importlib.util.spec_from_file_location(os.path.splitext(name)[0], path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+# 2048
+def play_2048(module, policy, seed, size=4):
+    ''' play one seeded game to the end without animation, return its summary '''
+    game = module.Game(random.Random(seed), size)
+    game.instant = True
+    game.start()
+    score, moves = 0, 0
+    while True:
+        for how in policy(game):
+            if game.is_moved(game.grid, how, True):
+                break
+        else:
+            break
+        score += sum([2 * tile.value for tile in game.merged_tiles])
+        game.commit_move()
+        game.finish_moving()
+        moves += 1
+    max_tile = max([tile.value for col in game.grid for tile in col if tile])
+    return {'seed': seed, 'score': score, 'max_tile': max_tile, 'moves': moves}
+
+def random_policy(game):
+    ''' try the directions in random order '''
+    directions = DIRECTIONS[:]
+    game.rng.shuffle(directions)
+    return directions
+
+def bot_policy(module, searcher):
+    ''' the expectimax move where the bitboard engine holds the grid, the greedy
+        one on other sizes and past 2 ** 15 tiles, as Game.bot_move '''
+    def policy(game):
+        if module.searchable(game.grid):
+            how = searcher.search(module.pack(game.grid))
+        else:
+            how = game.greedy_move()
+        return [how] if how else []
+    return policy
+
+def report(results, seconds):
+    ''' print games/sec, max tile and score distributions '''
+    games = len(results)
+    print('%d games in %.2f s, %.1f games/sec, %.0f moves/sec' % (
+        games, seconds, games / seconds, sum([r['moves'] for r in results]) / seconds))
+    print('max tile:')
+    for tile, count in sorted(collections.Counter([r['max_tile'] for r in results]).items()):
+        print('  %6d %6d  %5.1f%%' % (tile, count, 100.0 * count / games))
+    report_scores(results)
+
+def report_scores(results):
+    ''' print the score distribution '''
+    games = len(results)
+    scores = sorted([r['score'] for r in results])
+    print('score: min %d, p25 %d, median %d, p75 %d, max %d, mean %.1f' % (
+        scores[0], scores[games // 4], scores[games // 2], scores[games * 3 // 4],
+        scores[-1], float(sum(scores)) / games))
+
+# Tetris
+FPS = 60
+
+class RandomKeys:
+    ''' Tetris planner: a random turn and slide for every piece, then a drop '''
+    def plan(self, game):
+        turns = game.rng.randrange(4)
+        slide = game.rng.randint(-5, 5)
+        return ['up'] * turns + ['left'] * -slide + ['right'] * slide + ['down']
+
+def play_tetris(module, planner, seed, instant=False):
+    ''' play one seeded game to the end in virtual time, the autopilot taking
+        its keys from planner; with instant, chain reactions take no time;
+        return its summary '''
+    game = module.Game(random.Random(seed))
+    game.planner = planner
+    game.autopilot = True
+    game.instant = instant
+    frame = Timer(1000.0 / FPS, game.update) # the draw handler, minus drawing
+    clock = Clock([game.time1, game.time2, game.time3, game.timer, frame])
+    game.start()
+    frame.start()
+    while game.state == 1 and clock.step():
+        pass
+    while game.points: # the frames after the end still add points up
+        game.update()
+    return {'seed': seed, 'score': game.score, 'seconds': clock.now / 1000.0,
+            'topped_out': game.time > 0, 'settle_ticks': game.pile.ticks}
+
+def report_tetris(results, seconds):
+    ''' print games/sec, simulated speed and the score distribution '''
+    games = len(results)
+    played = sum([r['seconds'] for r in results])
+    print('%d games in %.2f s, %.1f games/sec, %.0f simulated seconds/sec' % (
+        games, seconds, games / seconds, played / seconds))
+    print('topped out: %d, ran out of time: %d' % (
+        sum([r['topped_out'] for r in results]), sum([not r['topped_out'] for r in results])))
+    print('settle ticks: %.1f per game' % (float(sum([r['settle_ticks'] for r in results])) / games))
+    report_scores(results)
+
+def main():
+    parser = argparse.ArgumentParser(description='Play games headless and report throughput.')
+    parser.add_argument('game', choices=['2048', 'tetris'])
+    parser.add_argument('-n', '--games', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0, help='game i is seeded with seed + i')
+    parser.add_argument('--size', type=int, default=4, help='2048 board size, the bot searches 4 x 4 only and is greedy on others')
+    parser.add_argument('--policy', choices=['random', 'bot'], default='random')
+    parser.add_argument('--depth', type=int, default=2, help='2048 bot search depth')
+    parser.add_argument('--budget', type=int, default=100,
+                        help='bot milliseconds per move, 0 for no limit')
+    parser.add_argument('--instant', action='store_true',
+                        help='tetris chain reactions resolve at once instead of tick by tick')
+    args = parser.parse_args()
+
+    if args.game == 'tetris':
+        module = load('Tetris.py')
+        planner = RandomKeys()
+        if args.policy == 'bot':
+            planner = module.Planner(args.budget)
+        results = []
+        start = time.time()
+        for i in range(args.games):
+            results.append(play_tetris(module, planner, args.seed + i, args.instant))
+        report_tetris(results, time.time() - start)
+        return
+
+    module = load('2048_Softcore.py')
+    policy = random_policy
+    if args.policy == 'bot':
+        policy = bot_policy(module, module.Searcher(args.depth, args.budget))
+    results = []
+    start = time.time()
+    for i in range(args.games):
+        results.append(play_2048(module, policy, args.seed + i, args.size))
+    report(results, time.time() - start)
+
+if __name__ == '__main__':
+    main()
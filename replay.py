@@ -0,0 +1,260 @@
+''' Record games and play them back at full speed.
+
+A replay is a header, then one event per handler call the game received:
+key presses and releases, clicks, buttons, and timer ticks. Each event is
+stamped with the number of frames drawn before it, so playing the events
+back between the same frames repeats the session exactly, whatever the
+timing of the browser or desktop window it was recorded in. The seed is
+given to the global random before the game file is imported.
+
+    python replay.py record tetris -o best.rpl   # needs SimpleGUICS2Pygame
+    python replay.py monkey flappy -n 1000 -o replays/
+    python replay.py play replays/*.rpl > summaries.jsonl
+
+The 2048 Bot Move button and the Tetris autopilot search against the clock
+and replay exactly only with their budget set to 0.
+'''
+import os, sys, json, time, types, random, struct, argparse
+
+import headless, assets
+
+MAGIC = b'RPLY'
+VERSION = 1
+HEADER = struct.Struct('<4sBBQ') # magic, version, game, seed
+EVENT = struct.Struct('<IBhh')   # frames drawn before, kind, a, b
+KEYDOWN, KEYUP, CLICK, TIMER, BUTTON, END = range(6)
+
+# name -> (game file, monkey keys, monkey clicks, monkey buttons)
+GAMES = [('2048_softcore', ('2048_Softcore.py', ['up', 'down', 'left', 'right'], [], [0, 1, 2, 4])),
+         ('2048_hardcore', ('2048_Hardcore.py', ['up', 'down', 'left', 'right'], [], [0])),
+         ('tetris', ('Tetris.py', ['up', 'down', 'left', 'right', 'h'], [(240, 200)], [])),
+         ('flappy', ('Flappy_Bird.py', ['space'], [], []))]
+NAMES = [name for name, game in GAMES]
+
+class Session:
+    ''' a simplegui module over base that keeps the handlers a game
+        registers, and logs each call to them when given a replay file '''
+    def __init__(self, base, out=None):
+        self.out = out
+        self.frames = 0    # draw handler calls so far
+        self.handlers = {} # 'draw', 'keydown', 'keyup', 'click'
+        self.timers = []   # timers of base in creation order
+        self.ticks = []    # their handlers
+        self.buttons = []  # button handlers in creation order
+        self.module = types.ModuleType('simplegui')
+        self.module.__dict__.update(dict([(k, v) for k, v in vars(base).items() if not k.startswith('__')]))
+        self.module.create_frame = self.create_frame
+        self.module.create_timer = self.create_timer
+        self.base = base
+
+    def logged(self, kind, handler, index=0):
+        ''' return handler, logging its calls '''
+        def call(*args):
+            if self.out:
+                a, b = index, 0
+                if kind == KEYDOWN or kind == KEYUP:
+                    a = args[0]
+                elif kind == CLICK:
+                    a, b = args[0]
+                self.out.write(EVENT.pack(self.frames, kind, int(a), int(b)))
+            return handler(*args)
+        return call
+
+    def draw(self, handler):
+        def call(canvas):
+            handler(canvas)
+            self.frames += 1
+        return call
+
+    def create_frame(self, *args):
+        return SessionFrame(self, self.base.create_frame(*args))
+
+    def create_timer(self, interval, handler):
+        self.ticks.append(self.logged(TIMER, handler, len(self.ticks)))
+        self.timers.append(self.base.create_timer(interval, self.ticks[-1]))
+        return self.timers[-1]
+
+    def close(self):
+        ''' log the frames after the last event and close the file '''
+        if self.out:
+            self.out.write(EVENT.pack(self.frames, END, 0, 0))
+            self.out.close()
+            self.out = None
+
+class SessionFrame:
+    ''' a frame of the base module whose handlers go through a Session '''
+    def __init__(self, session, frame):
+        self.session = session
+        self.frame = frame
+
+    def __getattr__(self, name):
+        return getattr(self.frame, name)
+
+    def handle(self, name, handler):
+        self.session.handlers[name] = handler
+        return handler
+
+    def set_draw_handler(self, handler):
+        self.frame.set_draw_handler(self.handle('draw', self.session.draw(handler)))
+
+    def set_keydown_handler(self, handler):
+        self.frame.set_keydown_handler(self.handle('keydown', self.session.logged(KEYDOWN, handler)))
+
+    def set_keyup_handler(self, handler):
+        self.frame.set_keyup_handler(self.handle('keyup', self.session.logged(KEYUP, handler)))
+
+    def set_mouseclick_handler(self, handler):
+        self.frame.set_mouseclick_handler(self.handle('click', self.session.logged(CLICK, handler)))
+
+    def add_button(self, text, handler, *args):
+        buttons = self.session.buttons
+        buttons.append(self.session.logged(BUTTON, handler, len(buttons)))
+        return self.frame.add_button(text, buttons[-1], *args)
+
+def load(name, session, seed):
+    ''' import a game file under session with the global random seeded '''
+    previous = sys.modules.get('simplegui')
+    sys.modules['simplegui'] = session.module
+    random.seed(seed)
+    try:
+        return headless.load(name)
+    finally:
+        if previous:
+            sys.modules['simplegui'] = previous
+
+def events(path):
+    ''' yield the header (game, seed), then every event of a replay file as
+        (frames, kind, a, b), reading as it goes '''
+    with open(path, 'rb') as replay:
+        magic, version, game, seed = HEADER.unpack(replay.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a version %d replay' % (path, VERSION))
+        yield game, seed
+        while True:
+            chunk = replay.read(EVENT.size)
+            if len(chunk) < EVENT.size:
+                return
+            yield EVENT.unpack(chunk)
+
+def summary(module):
+    ''' return what a replay ended with: score and best, or the 2048 tiles '''
+    game = module.game
+    if hasattr(game, 'grid'):
+        tiles = [tile.value for col in game.grid for tile in col if tile]
+        return {'max_tile': max(tiles), 'tiles': sum(tiles)}
+    return {'score': game.score, 'best': game.best}
+
+def play(path):
+    ''' play a replay file through the null backend as fast as possible,
+        return its summary '''
+    stream = events(path)
+    game, seed = next(stream)
+    session = Session(headless.backend())
+    module = load(GAMES[game][1][0], session, seed)
+    canvas = headless.Canvas()
+    count = 0
+    for frames, kind, a, b in stream:
+        while session.frames < frames:
+            session.handlers['draw'](canvas)
+        if kind == KEYDOWN:
+            session.handlers['keydown'](a)
+        elif kind == KEYUP:
+            session.handlers['keyup'](a)
+        elif kind == CLICK:
+            session.handlers['click']((a, b))
+        elif kind == TIMER:
+            session.ticks[a]()
+        elif kind == BUTTON:
+            session.buttons[a]()
+        count += 1
+    result = {'file': path, 'game': NAMES[game], 'seed': seed, 'frames': session.frames, 'events': count}
+    result.update(summary(module))
+    return result
+
+def record(name, path, seed):
+    ''' play a game by hand in a SimpleGUICS2Pygame window, recorded to path,
+        with images and sounds from the asset cache '''
+    import SimpleGUICS2Pygame.simpleguics2pygame as simplegui
+    cache = assets.Assets(simplegui)
+    session = Session(cache.module, open(path, 'wb'))
+    session.out.write(HEADER.pack(MAGIC, VERSION, NAMES.index(name), seed))
+    try:
+        load(dict(GAMES)[name][0], session, seed) # returns once the window closes
+    finally:
+        session.close()
+        cache.report()
+
+def monkey(name, path, seed, seconds, rate=0.05):
+    ''' record a headless session of random input: keys held for a few
+        frames, clicks and buttons, on a virtual clock; return its summary '''
+    filename, keys, clicks, buttons = dict(GAMES)[name]
+    session = Session(headless.backend(), open(path, 'wb'))
+    session.out.write(HEADER.pack(MAGIC, VERSION, NAMES.index(name), seed))
+    module = load(filename, session, seed)
+    rng = random.Random(seed)
+    canvas = headless.Canvas()
+    held = [] # (frame to release at, key)
+
+    def frame():
+        for release in [item for item in held if item[0] <= session.frames]:
+            held.remove(release)
+            if 'keyup' in session.handlers:
+                session.handlers['keyup'](release[1])
+        if rng.random() < rate:
+            choice = rng.randrange(len(keys) + len(clicks) + len(buttons))
+            if choice < len(keys):
+                key = headless.KEY_MAP[keys[choice]]
+                session.handlers['keydown'](key)
+                held.append((session.frames + rng.randint(1, 10), key))
+            elif choice < len(keys) + len(clicks):
+                session.handlers['click'](clicks[choice - len(keys)])
+            else:
+                session.buttons[buttons[choice - len(keys) - len(clicks)]]()
+        session.handlers['draw'](canvas)
+
+    clock = headless.Clock(session.timers + [headless.Timer(1000.0 / headless.FPS, frame)])
+    clock.timers[-1].start()
+    while clock.now < seconds * 1000 and clock.step():
+        pass
+    session.close()
+    result = {'file': path, 'game': name, 'seed': seed, 'frames': session.frames}
+    result.update(summary(module))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Record games and play them back at full speed.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    rec = commands.add_parser('record', help='play by hand in a SimpleGUICS2Pygame window')
+    rec.add_argument('game', choices=NAMES)
+    rec.add_argument('-o', '--output', required=True)
+    rec.add_argument('--seed', type=int, default=None, help='random if not given')
+    mon = commands.add_parser('monkey', help='record headless sessions of random input')
+    mon.add_argument('game', choices=NAMES)
+    mon.add_argument('-n', '--games', type=int, default=100)
+    mon.add_argument('--seed', type=int, default=0, help='session i is seeded with seed + i')
+    mon.add_argument('--seconds', type=float, default=60, help='virtual seconds per session')
+    mon.add_argument('-o', '--output', default='replays', help='directory')
+    pla = commands.add_parser('play', help='play replays headless, print one JSON summary per file')
+    pla.add_argument('files', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+        record(args.game, args.output, seed)
+    elif args.command == 'monkey':
+        if not os.path.isdir(args.output):
+            os.makedirs(args.output)
+        for seed in range(args.seed, args.seed + args.games):
+            path = os.path.join(args.output, '%s-%d.rpl' % (args.game, seed))
+            print(json.dumps(monkey(args.game, path, seed, args.seconds), sort_keys=True))
+    else:
+        start = time.time()
+        for path in args.files:
+            print(json.dumps(play(path), sort_keys=True))
+        seconds = time.time() - start
+        sys.stderr.write('%d replays in %.2f s, %.1f replays/sec\n' % (
+            len(args.files), seconds, len(args.files) / seconds))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+''' Self-play farm: the 2048 bot over many seeded games on every core.
+
+Game i is played with its own random.Random(seed + i), so any game can be
+replayed from its seed alone. Each summary is appended to a JSONL file as
+soon as the game ends; nothing is kept in memory, and rerunning the same
+command skips seeds that are already in the file.
+
+    python selfplay.py -n 100000 -o selfplay.jsonl --depth 2
+'''
+import os, json, time, argparse, collections, multiprocessing
+
+import headless
+
+worker = {}
+
+def init_worker(depth, budget):
+    ''' load the game and build the tables once per process '''
+    worker['module'] = headless.load('2048_Softcore.py')
+    worker['module'].build_tables()
+    worker['policy'] = headless.bot_policy(worker['module'], worker['module'].Searcher(depth, budget))
+
+def play(seed):
+    start = time.time()
+    result = headless.play_2048(worker['module'], worker['policy'], seed)
+    result['seconds'] = round(time.time() - start, 3)
+    return result
+
+def done_seeds(path):
+    ''' return the seeds already recorded in path '''
+    seeds = set()
+    if os.path.exists(path):
+        for line in open(path):
+            if line.strip():
+                seeds.add(json.loads(line)['seed'])
+    return seeds
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the 2048 bot over seeded games in parallel.')
+    parser.add_argument('-n', '--games', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0, help='game i is seeded with seed + i')
+    parser.add_argument('-o', '--output', default='selfplay.jsonl')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--depth', type=int, default=2, help='bot search depth')
+    parser.add_argument('--budget', type=int, default=0,
+                        help='bot milliseconds per move, 0 for no limit (reproducible)')
+    args = parser.parse_args()
+
+    done = done_seeds(args.output)
+    seeds = [s for s in range(args.seed, args.seed + args.games) if s not in done]
+    tiles = collections.Counter()
+    start = time.time()
+    pool = multiprocessing.Pool(args.jobs, init_worker, (args.depth, args.budget))
+    with open(args.output, 'a') as output:
+        for count, result in enumerate(pool.imap_unordered(play, seeds, 4), 1):
+            output.write(json.dumps(result, sort_keys=True) + '\n')
+            output.flush()
+            tiles[result['max_tile']] += 1
+            if count % 100 == 0 or count == len(seeds):
+                print('%d/%d games, %.1f games/sec' % (count, len(seeds), count / (time.time() - start)))
+    pool.close()
+    pool.join()
+    print('max tile: ' + ', '.join(['%d x%d' % item for item in sorted(tiles.items())]))
+
+if __name__ == '__main__':
+    main()